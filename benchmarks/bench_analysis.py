@@ -0,0 +1,73 @@
+# Benchmark de la primera pasada en paralelo: paginas/segundo del analisis
+# (CUIT / nro_guia) en un proceso y repartido en tramos entre 2, 4, ... hasta
+# --procesos procesos, verificando que los resultados sean los mismos.
+# Uso: python benchmarks/bench_analysis.py [--pdf archivo.pdf] [--paginas N]
+#      [--procesos N] [--cuits N] [--paginas-por-guia N] [--formatos AF,CI,numerico]
+import argparse
+import logging
+import os
+import sys
+import tempfile
+import time
+from concurrent.futures import ProcessPoolExecutor
+
+from pypdf import PdfReader
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import main
+from fields import FieldTimings
+from synthetic_dsi import add_generator_arguments, generate_dsi, generator_options
+
+
+def fields_pass(pdf_file_path, workers):
+    # Se mide desde la apertura: el camino paralelo tambien abre el PDF en
+    # cada tramo
+    start = time.perf_counter()
+    reader = PdfReader(pdf_file_path)
+    total_pages = len(reader.pages) - 1
+    timings = FieldTimings()
+    if workers == 1:
+        records = main.analyze_pages(reader, total_pages, timings)
+    else:
+        records = main.analyze_pages_parallel(reader, pdf_file_path, total_pages, timings, workers=workers)
+    fields = [(record.cuit, record.nro_guia) for record in records]
+    return fields, time.perf_counter() - start
+
+
+def worker_counts(limit):
+    count = 1
+    while count < limit:
+        yield count
+        count *= 2
+    yield limit
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Benchmark de la primera pasada en paralelo.")
+    parser.add_argument("--pdf", help="DSI existente; sin este argumento se genera uno sintetico")
+    parser.add_argument("--paginas", type=int, default=2000, help="paginas del DSI sintetico")
+    parser.add_argument("--procesos", type=int, default=os.cpu_count() or 1, help="maximo de procesos")
+    add_generator_arguments(parser)
+    args = parser.parse_args()
+
+    logging.getLogger("dsi").setLevel(logging.ERROR)
+    pdf_file_path = args.pdf
+    if not pdf_file_path:
+        pdf_file_path = os.path.join(tempfile.mkdtemp(), "dsi_analisis.pdf")
+        generate_dsi(pdf_file_path, args.paginas, **generator_options(args))
+
+    baseline = None
+    for workers in worker_counts(args.procesos):
+        # Pool nuevo por cantidad de procesos; se levanta antes de medir
+        main.PROCESS_WORKERS = workers
+        main._process_pool = ProcessPoolExecutor(max_workers=workers)
+        main._process_pool.submit(int).result()
+        fields, elapsed = fields_pass(pdf_file_path, workers)
+        main._process_pool.shutdown()
+        if baseline is None:
+            baseline = (fields, elapsed)
+        elif fields != baseline[0]:
+            print(f"Atención: con {workers} procesos los resultados no coinciden con un proceso")
+        print(f"{workers:>3} procesos: {len(fields)} paginas en {elapsed:.2f}s -> "
+              f"{len(fields) / elapsed:.1f} paginas/s (x{baseline[1] / elapsed:.2f})")
@@ -0,0 +1,56 @@
+# Benchmark de la busqueda de cambios de guia: paginas analizadas y tiempo
+# recorriendo todas las paginas y con la busqueda al galope / binaria,
+# verificando que los bloques resultantes sean los mismos.
+# Uso: python benchmarks/bench_boundaries.py [--pdf archivo.pdf] [--paginas N]
+#      [--cuits N] [--paginas-por-guia N] [--formatos AF,CI,numerico]
+import argparse
+import logging
+import os
+import sys
+import tempfile
+import time
+
+from pypdf import PdfReader
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import main
+from fields import FieldTimings
+from synthetic_dsi import add_generator_arguments, generate_dsi, generator_options
+
+
+def blocks_pass(pdf_file_path, boundary_search):
+    main.BOUNDARY_SEARCH = boundary_search
+    timings = FieldTimings()
+    reader = PdfReader(pdf_file_path)
+    total_pages = len(reader.pages) - 1
+    start = time.perf_counter()
+    blocks = list(main.iter_blocks(main.analyze_pages(reader, total_pages, timings), main.LogBuffer()))
+    elapsed = time.perf_counter() - start
+    analyzed = total_pages - timings.counters.get("inferidas", 0)
+    return blocks, analyzed, elapsed
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Benchmark de la busqueda de cambios de guia.")
+    parser.add_argument("--pdf", help="DSI existente; sin este argumento se genera uno sintetico")
+    parser.add_argument("--paginas", type=int, default=600, help="paginas del DSI sintetico")
+    add_generator_arguments(parser)
+    parser.set_defaults(paginas_por_guia=30)
+    args = parser.parse_args()
+
+    logging.getLogger("dsi").setLevel(logging.ERROR)
+    pdf_file_path = args.pdf
+    if not pdf_file_path:
+        pdf_file_path = os.path.join(tempfile.mkdtemp(), "dsi_limites.pdf")
+        generate_dsi(pdf_file_path, args.paginas, **generator_options(args))
+
+    results = {}
+    for name, boundary_search in (("completo", False), ("busqueda", True)):
+        blocks, analyzed, elapsed = blocks_pass(pdf_file_path, boundary_search)
+        results[name] = (blocks, elapsed)
+        print(f"{name:<10} {len(blocks)} bloques, {analyzed} paginas analizadas en {elapsed:.2f}s")
+
+    if results["completo"][0] != results["busqueda"][0]:
+        print("Atención: los bloques de la búsqueda no coinciden con el recorrido completo")
+    print(f"Aceleracion: x{results['completo'][1] / results['busqueda'][1]:.2f}")
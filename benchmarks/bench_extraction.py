@@ -0,0 +1,61 @@
+# Benchmark de extraccion de texto: paginas/segundo antes y despues del
+# analisis de pagina en una sola pasada.
+# Uso: python benchmarks/bench_extraction.py [archivo.pdf] [paginas]
+import os
+import re
+import sys
+import tempfile
+import time
+
+from pypdf import PdfReader
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import main
+from synthetic_dsi import generate_dsi
+
+
+def legacy_pass(pdf_file_path):
+    # Camino anterior: el PDF se abre dos veces y cada pagina se extrae dos veces
+    reader = PdfReader(pdf_file_path)
+    all_text = [page.extract_text() for page in PdfReader(pdf_file_path).pages]
+    total_pages = len(reader.pages) - 1
+    for page_num in range(total_pages):
+        text = reader.pages[page_num].extract_text()
+        re.search(r'(CUIT|CUIL)\s*-\s*(\d+\s*\d*)', text)
+        all_text[page_num].split("\n")
+    return total_pages
+
+
+def single_pass(pdf_file_path):
+    # Se compara solo la pasada unica sobre el texto completo: sin cabecera,
+    # pre-escaneo ni busqueda de limites, que tienen sus propios benchmarks
+    main.HEADER_ONLY = False
+    main.RAW_PRESCAN = False
+    main.BOUNDARY_SEARCH = False
+    reader = PdfReader(pdf_file_path)
+    total_pages = len(reader.pages) - 1
+    for _ in main.analyze_pages(reader, total_pages):
+        pass
+    return total_pages
+
+
+def measure(name, func, pdf_file_path):
+    start = time.perf_counter()
+    pages = func(pdf_file_path)
+    elapsed = time.perf_counter() - start
+    print(f"{name:<12} {pages} paginas en {elapsed:.2f}s -> {pages / elapsed:.1f} paginas/s")
+    return elapsed
+
+
+if __name__ == "__main__":
+    total = int(sys.argv[2]) if len(sys.argv) > 2 else 400
+    if len(sys.argv) > 1 and os.path.exists(sys.argv[1]):
+        pdf_file_path = sys.argv[1]
+    else:
+        pdf_file_path = os.path.join(tempfile.mkdtemp(), "dsi_bench.pdf")
+        generate_dsi(pdf_file_path, total)
+
+    before = measure("antes", legacy_pass, pdf_file_path)
+    after = measure("despues", single_pass, pdf_file_path)
+    print(f"Aceleracion: x{before / after:.2f}")
@@ -0,0 +1,82 @@
+# Micro-benchmark de extraccion de campos (CUIT y nro_guia) sobre un corpus
+# de textos de pagina. El corpus puede ser una lista de PDFs reales o de
+# archivos .txt (un texto de pagina por archivo, o carpetas con ellos); sin
+# argumentos se usa un DSI sintetico.
+# Uso: python benchmarks/bench_fields.py [archivo.pdf|archivo.txt|carpeta ...]
+import os
+import re
+import sys
+import tempfile
+import time
+
+from pypdf import PdfReader
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from fields import extract_cuit, header_lines, is_valid_nro_guia, read_nro_guia
+from synthetic_dsi import generate_dsi
+
+ROUNDS = 20
+
+
+def load_corpus(paths):
+    texts = []
+    for path in paths:
+        if os.path.isdir(path):
+            texts.extend(load_corpus(os.path.join(path, name) for name in sorted(os.listdir(path))))
+        elif path.endswith(".pdf"):
+            reader = PdfReader(path)
+            texts.extend(page.extract_text() for page in reader.pages[:-1])
+        elif path.endswith(".txt"):
+            with open(path, encoding="utf-8") as text_file:
+                texts.append(text_file.read())
+    return texts
+
+
+def legacy_fields(text):
+    # Extraccion anterior: regex sin compilar sobre toda la pagina y division
+    # de todas las lineas
+    match = re.search(r'(CUIT|CUIL)\s*-\s*(\d+\s*\d*)', text)
+    cuit = match.group(2).replace(" ", "") if match else None
+    lines = text.split("\n")
+    nro_guia = lines[10].split()[0] if len(lines) > 10 and lines[10].split() else None
+    if nro_guia:
+        re.match(r'^(AF\d+|CI\d+|\d+)$', nro_guia)
+    return cuit, nro_guia
+
+
+def current_fields(text):
+    cuit = extract_cuit(text)
+    nro_guia = read_nro_guia(header_lines(text), 0)
+    if nro_guia:
+        is_valid_nro_guia(nro_guia)
+    return cuit, nro_guia
+
+
+def measure(name, func, texts):
+    start = time.perf_counter()
+    for _ in range(ROUNDS):
+        for text in texts:
+            func(text)
+    elapsed = time.perf_counter() - start
+    per_page = elapsed * 1e6 / (ROUNDS * len(texts))
+    print(f"{name:<10} {per_page:8.2f} µs/página")
+    return per_page
+
+
+if __name__ == "__main__":
+    if len(sys.argv) > 1:
+        texts = load_corpus(sys.argv[1:])
+    else:
+        pdf_file_path = os.path.join(tempfile.mkdtemp(), "dsi_campos.pdf")
+        generate_dsi(pdf_file_path, 200)
+        texts = load_corpus([pdf_file_path])
+
+    print(f"Corpus: {len(texts)} páginas, {ROUNDS} rondas")
+    differences = sum(1 for text in texts if legacy_fields(text) != current_fields(text))
+    if differences:
+        print(f"Atención: {differences} páginas con resultado distinto al camino anterior")
+
+    before = measure("antes", legacy_fields, texts)
+    after = measure("despues", current_fields, texts)
+    print(f"Aceleracion: x{before / after:.2f}")
@@ -0,0 +1,54 @@
+# Benchmark de extraccion de la cabecera: paginas/segundo con el texto
+# completo de cada pagina y solo con la cabecera (HEADER_ONLY), verificando
+# que CUIT y nro_guia resulten iguales en ambos modos.
+# Uso: python benchmarks/bench_header.py [archivo.pdf] [paginas]
+import os
+import sys
+import tempfile
+import time
+
+from pypdf import PdfReader
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import main
+from fields import FieldTimings
+from synthetic_dsi import generate_dsi
+
+
+def fields_pass(pdf_file_path, header_only):
+    main.HEADER_ONLY = header_only
+    # Sin pre-escaneo ni busqueda de limites: se mide solo la extraccion de texto
+    main.RAW_PRESCAN = False
+    main.BOUNDARY_SEARCH = False
+    timings = FieldTimings()
+    reader = PdfReader(pdf_file_path)
+    total_pages = len(reader.pages) - 1
+    fields = [(record.cuit, record.nro_guia)
+              for record in main.analyze_pages(reader, total_pages, timings)]
+    return fields, timings
+
+
+def measure(name, pdf_file_path, header_only):
+    start = time.perf_counter()
+    fields, timings = fields_pass(pdf_file_path, header_only)
+    elapsed = time.perf_counter() - start
+    print(f"{name:<10} {len(fields)} paginas en {elapsed:.2f}s -> {len(fields) / elapsed:.1f} paginas/s"
+          f" ({timings.summary()})")
+    return elapsed, fields
+
+
+if __name__ == "__main__":
+    total = int(sys.argv[2]) if len(sys.argv) > 2 else 400
+    if len(sys.argv) > 1 and os.path.exists(sys.argv[1]):
+        pdf_file_path = sys.argv[1]
+    else:
+        pdf_file_path = os.path.join(tempfile.mkdtemp(), "dsi_cabecera.pdf")
+        generate_dsi(pdf_file_path, total)
+
+    before, full_fields = measure("completo", pdf_file_path, False)
+    after, header_fields = measure("cabecera", pdf_file_path, True)
+    differences = sum(1 for full, header in zip(full_fields, header_fields) if full != header)
+    if differences:
+        print(f"Atención: {differences} páginas con CUIT/nro_guia distinto al texto completo")
+    print(f"Aceleracion: x{before / after:.2f}")
@@ -0,0 +1,76 @@
+# Benchmark de memoria: RSS maximo al procesar un DSI sintetico grande en
+# modo streaming (lectura a demanda), cargando el archivo entero y en modo
+# paralelo (streaming con el pool de procesos, donde el proceso principal
+# recibe los bloques ya serializados).
+# Cada modo corre en un proceso aparte para medir su pico de RSS por separado.
+# Uso: python benchmarks/bench_memory.py [paginas]
+# Requiere el modulo resource (Linux / macOS).
+import json
+import os
+import resource
+import shutil
+import subprocess
+import sys
+import tempfile
+import time
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, ROOT)
+
+from synthetic_dsi import generate_dsi
+
+
+def peak_rss_mb(who=resource.RUSAGE_SELF):
+    # ru_maxrss esta en KB en Linux y en bytes en macOS
+    peak = resource.getrusage(who).ru_maxrss
+    return peak / 1024 / 1024 if sys.platform == "darwin" else peak / 1024
+
+
+def run_child(mode, pdf_file_path):
+    import logging
+    import main
+
+    work_directory = tempfile.mkdtemp()
+    main.base_directory = work_directory
+    main.PROCESS_WORKERS = max(os.cpu_count() or 1, 2) if mode == "paralelo" else 1
+    main.STREAMING = mode != "memoria"
+    # Sin cache de paginas: el segundo modo no debe reutilizar lo del primero
+    main.PAGE_CACHE = False
+    main.JOURNAL_DIRECTORY = os.path.join(work_directory, "journal")
+    main.OUTPUT_MANIFEST_PATH = os.path.join(work_directory, "salidas.sqlite")
+    main.get_output_writer().base_path = os.path.join(work_directory, "salida")
+    logging.getLogger("dsi").setLevel(logging.ERROR)
+
+    input_pdf = os.path.join(work_directory, os.path.basename(pdf_file_path))
+    shutil.copy(pdf_file_path, input_pdf)
+
+    start = time.perf_counter()
+    ok = main.split_pdf_add_img(input_pdf, main.SIGNATURE_IMAGE)
+    elapsed = time.perf_counter() - start
+    # Los procesos del pool solo cuentan en RUSAGE_CHILDREN una vez terminados
+    main.get_process_pool().shutdown()
+    shutil.rmtree(work_directory, ignore_errors=True)
+    print(json.dumps({
+        "modo": mode, "ok": ok, "segundos": round(elapsed, 2),
+        "rss_max_mb": round(peak_rss_mb(), 1),
+        "rss_max_pool_mb": round(peak_rss_mb(resource.RUSAGE_CHILDREN), 1),
+    }))
+
+
+if __name__ == "__main__":
+    if len(sys.argv) > 1 and sys.argv[1] == "--child":
+        run_child(sys.argv[2], sys.argv[3])
+        sys.exit(0)
+
+    total = int(sys.argv[1]) if len(sys.argv) > 1 else 5000
+    pdf_file_path = os.path.join(tempfile.mkdtemp(), "dsi_memoria.pdf")
+    generate_dsi(pdf_file_path, total)
+    size_mb = os.path.getsize(pdf_file_path) / 1024 / 1024
+    print(f"Archivo sintetico: {total} paginas, {size_mb:.1f} MB")
+
+    for mode in ("memoria", "streaming", "paralelo"):
+        output = subprocess.run(
+            [sys.executable, os.path.abspath(__file__), "--child", mode, pdf_file_path],
+            capture_output=True, text=True, check=True,
+        ).stdout
+        print(output.strip().splitlines()[-1])
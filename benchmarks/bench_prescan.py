@@ -0,0 +1,58 @@
+# Benchmark del pre-escaneo del content stream: paginas/segundo leyendo CUIT
+# y nro_guia con extract_text y con el pre-escaneo de los operadores de
+# texto (RAW_PRESCAN), verificando que resulten iguales en ambos modos.
+# Recorre todas las paginas (sin busqueda de cambios de guia).
+# Uso: python benchmarks/bench_prescan.py [--pdf archivo.pdf] [--paginas N]
+#      [--cuits N] [--paginas-por-guia N] [--formatos AF,CI,numerico]
+import argparse
+import logging
+import os
+import sys
+import tempfile
+import time
+
+from pypdf import PdfReader
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import main
+from fields import FieldTimings
+from synthetic_dsi import add_generator_arguments, generate_dsi, generator_options
+
+
+def fields_pass(pdf_file_path, raw_prescan):
+    main.RAW_PRESCAN = raw_prescan
+    main.BOUNDARY_SEARCH = False
+    timings = FieldTimings()
+    reader = PdfReader(pdf_file_path)
+    total_pages = len(reader.pages) - 1
+    start = time.perf_counter()
+    fields = [(record.cuit, record.nro_guia)
+              for record in main.analyze_pages(reader, total_pages, timings)]
+    return fields, timings, time.perf_counter() - start
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Benchmark del pre-escaneo del content stream.")
+    parser.add_argument("--pdf", help="DSI existente; sin este argumento se genera uno sintetico")
+    parser.add_argument("--paginas", type=int, default=1000, help="paginas del DSI sintetico")
+    add_generator_arguments(parser)
+    args = parser.parse_args()
+
+    logging.getLogger("dsi").setLevel(logging.ERROR)
+    pdf_file_path = args.pdf
+    if not pdf_file_path:
+        pdf_file_path = os.path.join(tempfile.mkdtemp(), "dsi_preescaneo.pdf")
+        generate_dsi(pdf_file_path, args.paginas, **generator_options(args))
+
+    results = {}
+    for name, raw_prescan in (("texto", False), ("preescaneo", True)):
+        fields, timings, elapsed = fields_pass(pdf_file_path, raw_prescan)
+        results[name] = (fields, elapsed)
+        print(f"{name:<10} {len(fields)} paginas en {elapsed:.2f}s -> {len(fields) / elapsed:.1f} paginas/s"
+              f" ({timings.summary()})")
+
+    differences = sum(1 for text, raw in zip(results["texto"][0], results["preescaneo"][0]) if text != raw)
+    if differences:
+        print(f"Atención: {differences} páginas con CUIT/nro_guia distinto a extract_text")
+    print(f"Aceleracion: x{results['texto'][1] / results['preescaneo'][1]:.2f}")
@@ -0,0 +1,135 @@
+# Benchmark por etapas del procesamiento de un DSI: abrir, extraer, agrupar,
+# firmar (serializar cada bloque con la firma), escribir y mover. Informa en
+# JSON segundos, paginas/s y MB/s de cada etapa y del total, y el RSS maximo,
+# para comparar resultados entre versiones.
+# Uso: python benchmarks/bench_stages.py [--pdf archivo.pdf] [--paginas N]
+#      [--cuits N] [--paginas-por-guia N] [--formatos AF,CI,numerico]
+#      [--salida resultado.json]
+import argparse
+import json
+import logging
+import os
+import shutil
+import subprocess
+import sys
+import tempfile
+import time
+from contextlib import contextmanager
+
+from pypdf import PdfReader
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, ROOT)
+
+import main
+from mappedfile import MappedFile
+from output_writer import OutputWriter
+from synthetic_dsi import add_generator_arguments, generate_dsi, generator_options
+
+STAGES = ("abrir", "extraer", "agrupar", "firmar", "escribir", "mover")
+
+
+def peak_rss_mb():
+    # ru_maxrss esta en KB en Linux y en bytes en macOS; sin resource
+    # (Windows) no se informa
+    try:
+        import resource
+    except ImportError:
+        return None
+    peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    return round(peak / 1024 / 1024 if sys.platform == "darwin" else peak / 1024, 1)
+
+
+def code_version():
+    try:
+        return subprocess.run(
+            ["git", "describe", "--always", "--dirty"], cwd=ROOT,
+            capture_output=True, text=True, check=True,
+        ).stdout.strip()
+    except (OSError, subprocess.CalledProcessError):
+        return None
+
+
+def run_stages(pdf_file_path, work_directory):
+    seconds = dict.fromkeys(STAGES, 0.0)
+
+    @contextmanager
+    def stage(name):
+        start = time.perf_counter()
+        yield
+        seconds[name] += time.perf_counter() - start
+
+    os.makedirs(work_directory, exist_ok=True)
+    main.base_directory = work_directory
+    input_pdf = os.path.join(work_directory, os.path.basename(pdf_file_path))
+    shutil.copy(pdf_file_path, input_pdf)
+    output_writer = OutputWriter(os.path.join(work_directory, "salida"), workers=main.OUTPUT_WRITERS)
+
+    with MappedFile(input_pdf) as mapped:
+        with stage("abrir"):
+            reader = PdfReader(mapped.buffer)
+            total_pages = len(reader.pages) - 1
+        with stage("extraer"):
+            records = list(main.analyze_pages(reader, total_pages))
+        with stage("agrupar"):
+            blocks = list(main.iter_blocks(records, main.LogBuffer()))
+        with stage("firmar"):
+            data = [main.build_block(reader, block, main.SIGNATURE_IMAGE) for block in blocks]
+        with stage("escribir"):
+            writes = [output_writer.submit(block.cuit, block.nro_guia, block_data)
+                      for block, block_data in zip(blocks, data)]
+            failed = output_writer.wait(writes)
+        del reader
+    output_writer.shutdown()
+
+    with stage("mover"):
+        main.mover_pdf_a_procesados(input_pdf)
+
+    return total_pages, len(blocks), failed, seconds
+
+
+def rates(seconds, pages, size_mb):
+    return {
+        "segundos": round(seconds, 4),
+        "paginas_s": round(pages / seconds, 1) if seconds else None,
+        "mb_s": round(size_mb / seconds, 2) if seconds else None,
+    }
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Benchmark por etapas del procesador de DSI.")
+    parser.add_argument("--pdf", help="DSI existente; sin este argumento se genera uno sintetico")
+    parser.add_argument("--paginas", type=int, default=400, help="paginas del DSI sintetico")
+    parser.add_argument("--salida", help="archivo donde guardar el JSON")
+    add_generator_arguments(parser)
+    args = parser.parse_args()
+
+    logging.getLogger("dsi").setLevel(logging.ERROR)
+    work_directory = tempfile.mkdtemp()
+    pdf_file_path = args.pdf
+    if not pdf_file_path:
+        pdf_file_path = os.path.join(work_directory, "dsi_etapas.pdf")
+        generate_dsi(pdf_file_path, args.paginas, **generator_options(args))
+    size_mb = os.path.getsize(pdf_file_path) / 1024 / 1024
+
+    try:
+        pages, blocks, failed, seconds = run_stages(pdf_file_path, os.path.join(work_directory, "trabajo"))
+    finally:
+        shutil.rmtree(work_directory, ignore_errors=True)
+
+    result = {
+        "version": code_version(),
+        "archivo": os.path.basename(pdf_file_path),
+        "paginas": pages,
+        "bloques": blocks,
+        "bloques_fallidos": failed,
+        "mb": round(size_mb, 2),
+        "etapas": {name: rates(seconds[name], pages, size_mb) for name in STAGES},
+        "total": rates(sum(seconds.values()), pages, size_mb),
+        "rss_max_mb": peak_rss_mb(),
+    }
+    output = json.dumps(result, indent=2, ensure_ascii=False)
+    if args.salida:
+        with open(args.salida, "w", encoding="utf-8") as result_file:
+            result_file.write(output + "\n")
+    print(output)
@@ -0,0 +1,152 @@
+# Generador de archivos DSI sinteticos para los benchmarks.
+# Reproduce la disposicion que espera main.py: el nro_guia al inicio de la
+# linea 10 del texto extraido, la linea "CUIT - <numero>" en la cabecera y
+# una tabla de items debajo, con una hoja final de resumen que se ignora.
+# Uso: python benchmarks/synthetic_dsi.py [salida.pdf] [paginas]
+#      [--cuits N] [--paginas-por-guia N] [--formatos AF,CI,numerico]
+#      [--recursos-por-pagina]
+
+from PIL import Image
+from pypdf import PdfReader, PdfWriter
+from pypdf.generic import DictionaryObject, NameObject
+from reportlab.lib.pagesizes import letter
+from reportlab.lib.utils import ImageReader
+from reportlab.pdfgen import canvas
+import argparse
+import os
+
+# Formatos de nro_guia que acepta main.py
+NRO_GUIA_FORMATS = ("AF", "CI", "numerico")
+
+
+def cuit_with_check_digit(base):
+    # Calcula el digito verificador de un CUIT de 10 digitos base
+    weights = (5, 4, 3, 2, 7, 6, 5, 4, 3, 2)
+    total = sum(int(d) * w for d, w in zip(base, weights))
+    check = 11 - total % 11
+    if check == 11:
+        check = 0
+    elif check == 10:
+        check = 9
+    return f"{base}{check}"
+
+
+def format_nro_guia(guia, nro_guia_format):
+    if nro_guia_format == "AF":
+        return f"AF{100000 + guia}"
+    if nro_guia_format == "CI":
+        return f"CI{200000 + guia}"
+    if nro_guia_format == "numerico":
+        return f"{300000 + guia}"
+    raise ValueError(f"Formato de nro_guia desconocido: {nro_guia_format}")
+
+
+def draw_dsi_page(can, cuit, nro_guia, page_in_guia, table_rows=40, logo=None):
+    width, height = letter
+    if logo is not None:
+        can.drawImage(logo, width - 200, height - 80, 160, 50)
+    header = [
+        "DECLARACION SIMPLIFICADA DE IMPORTACION",
+        "ADMINISTRACION FEDERAL DE INGRESOS PUBLICOS",
+        "Aduana: 001 BUENOS AIRES",
+        "Courier: EXPRESS CARGO S.A.",
+        f"CUIT - {cuit} Importador: CONSUMIDOR PARTICULAR",
+        "Condicion: RESPONSABLE INSCRIPTO",
+        "Domicilio: AV SIEMPRE VIVA 742",
+        "Fecha de oficializacion: 01/10/2024",
+        "Destinacion: IC05",
+        "Documento de transporte",
+        f"{nro_guia} Bultos 1 Peso 2,50 Kg Hoja {page_in_guia}",
+    ]
+    y = height - 40
+    for line in header:
+        can.drawString(40, y, line)
+        y -= 14
+    for row in range(table_rows):
+        y -= 12
+        if y < 40:
+            break
+        can.drawString(
+            40, y,
+            f"{row + 1:03d} 8471.30.12.000 EQUIPO PORTATIL {row * 3 + 1} U "
+            f"USD {row * 17.5 + 10:.2f} FOB {row * 2.25:.2f}",
+        )
+    can.showPage()
+
+
+def logo_image():
+    # Logo de la cabecera: un degradado, para que la imagen pese algo
+    return ImageReader(Image.linear_gradient("L").resize((480, 150)).convert("RGB"))
+
+
+def duplicate_page_resources(path):
+    # Reescribe el archivo con una copia propia de cada fuente y XObject por
+    # pagina, como los generadores que no comparten recursos entre paginas
+    writer = PdfWriter()
+    for page in PdfReader(path).pages:
+        page = writer.add_page(page)
+        resources = DictionaryObject(page["/Resources"])
+        for category in ("/Font", "/XObject"):
+            if category not in resources:
+                continue
+            entries = resources[category]
+            resources[NameObject(category)] = DictionaryObject({
+                name: entries[name].clone(writer, force_duplicate=True).indirect_reference
+                for name in entries
+            })
+        page[NameObject("/Resources")] = resources
+    temporary = f"{path}.tmp"
+    with open(temporary, "wb") as output:
+        writer.write(output)
+    os.replace(temporary, path)
+
+
+def generate_dsi(path, pages, pages_per_guia=3, table_rows=40, cuits=97, formats=("AF",),
+                 duplicate_resources=False):
+    # Las guias se reparten entre `cuits` importadores distintos y alternan
+    # los formatos de nro_guia de `formats`. Con duplicate_resources cada
+    # pagina lleva un logo y su propia copia de fuentes e imagenes
+    can = canvas.Canvas(path, pagesize=letter)
+    logo = logo_image() if duplicate_resources else None
+    for page_num in range(pages):
+        guia = page_num // pages_per_guia
+        cuit = cuit_with_check_digit(f"20{guia % cuits:08d}")
+        nro_guia = format_nro_guia(guia, formats[guia % len(formats)])
+        draw_dsi_page(can, cuit, nro_guia, page_num % pages_per_guia + 1, table_rows, logo)
+    # Hoja de resumen de la DSI, main.py la ignora
+    can.drawString(40, letter[1] - 40, "RESUMEN DE LA DSI")
+    can.showPage()
+    can.save()
+    if duplicate_resources:
+        duplicate_page_resources(path)
+    return path
+
+
+def add_generator_arguments(parser):
+    parser.add_argument("--cuits", type=int, default=97, help="CUITs distintos en el archivo")
+    parser.add_argument("--paginas-por-guia", type=int, default=3, help="paginas de cada guia")
+    parser.add_argument(
+        "--formatos", default="AF",
+        help=f"formatos de nro_guia separados por coma ({','.join(NRO_GUIA_FORMATS)})")
+    parser.add_argument(
+        "--recursos-por-pagina", action="store_true",
+        help="logo en cada pagina y una copia propia de fuentes e imagenes por pagina")
+
+
+def generator_options(args):
+    return {
+        "pages_per_guia": args.paginas_por_guia,
+        "cuits": args.cuits,
+        "formats": tuple(args.formatos.split(",")),
+        "duplicate_resources": args.recursos_por_pagina,
+    }
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Genera un DSI sintetico.")
+    parser.add_argument("output", nargs="?", default="dsi_sintetico.pdf")
+    parser.add_argument("total", nargs="?", type=int, default=100)
+    add_generator_arguments(parser)
+    args = parser.parse_args()
+    generate_dsi(args.output, args.total, **generator_options(args))
+    print(f"Generado {args.output} con {args.total} paginas + resumen")
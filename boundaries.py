@@ -0,0 +1,75 @@
+import dataclasses
+import logging
+
+logger = logging.getLogger("dsi.boundaries")
+
+
+def block_key(record):
+    return (record.cuit, record.nro_guia)
+
+
+def search_boundaries(analyze, total_pages, on_inferred=None, start=0):
+    # Las paginas de una guia son contiguas: en lugar de analizar todas, se
+    # avanza al galope (1, 2, 4, 8... paginas) mientras CUIT y nro_guia sigan
+    # iguales y el primer cambio se ubica con busqueda binaria. Las paginas
+    # del medio de una guia no se analizan: se entregan como copia del
+    # registro de la primera pagina, con su indice y sin texto.
+    # analyze(indice) devuelve el registro de esa pagina; los registros se
+    # entregan en orden, como el recorrido completo, desde la pagina start.
+    probed = {}
+
+    def probe(page_num):
+        record = probed.get(page_num)
+        if record is None:
+            record = probed[page_num] = analyze(page_num)
+        return record
+
+    while start < total_pages:
+        first = probe(start)
+        key = block_key(first)
+
+        # Galope: `same` es la ultima pagina confirmada igual y `end` la
+        # primera distinta (o el final del archivo)
+        same = start
+        step = 1
+        while True:
+            candidate = start + step
+            if candidate >= total_pages:
+                end = total_pages
+                break
+            if block_key(probe(candidate)) != key:
+                end = candidate
+                break
+            same = candidate
+            step *= 2
+
+        # Busqueda binaria del primer cambio entre same y end
+        while end - same > 1:
+            middle = (same + end) // 2
+            if block_key(probe(middle)) == key:
+                same = middle
+            else:
+                end = middle
+
+        for page_num in range(start, end):
+            record = probed.pop(page_num, None)
+            if record is None:
+                record = dataclasses.replace(first, index=page_num, text=None, lines=None)
+                if on_inferred:
+                    on_inferred()
+            yield record
+        start = end
+
+
+def verify_boundaries(searched, exhaustive, log=logger):
+    # Modo verificacion: compara pagina a pagina la busqueda con el recorrido
+    # completo y entrega los registros del recorrido completo
+    mismatches = 0
+    for found, expected in zip(searched, exhaustive):
+        if block_key(found) != block_key(expected):
+            mismatches += 1
+            log.warning(
+                f"Advertencia: Verificación de límites, página {expected.index + 1}: "
+                f"búsqueda={block_key(found)}, completo={block_key(expected)}")
+        yield expected
+    log.info(f"Verificación de límites: {mismatches} página(s) con diferencias")
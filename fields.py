@@ -0,0 +1,319 @@
+import logging
+import re
+import threading
+import time
+from functools import lru_cache
+from operator import mul
+
+logger = logging.getLogger("dsi.fields")
+
+# Patrones compilados una sola vez al importar el modulo
+CUIT_PATTERN = re.compile(r'(CUIT|CUIL)\s*-\s*(\d+\s*\d*)')
+NRO_GUIA_PATTERN = re.compile(r'AF\d+|CI\d+|\d+')
+
+# El CUIT se busca solo en una ventana corta a partir de la etiqueta
+CUIT_LABEL = "CUI"
+CUIT_WINDOW = 48
+CUIT_WEIGHTS = (5, 4, 3, 2, 7, 6, 5, 4, 3, 2)
+CUIT_WEIGHTS_SUM = sum(CUIT_WEIGHTS)
+
+# Linea del texto extraido donde empieza el documento de transporte
+NRO_GUIA_LINE = 10
+NRO_GUIA_MIN_LENGTH = 5
+
+# Fragmentos de texto maximos que se leen en modo solo cabecera
+HEADER_MAX_RUNS = 200
+
+# Pre-escaneo del content stream: operadores de texto (Tj, TJ, ', ") y de
+# posicionamiento, con los strings literales, hexadecimales y arrays de TJ
+RAW_TEXT_TOKEN = re.compile(
+    rb"\[(?P<array>(?:\((?:\\.|[^\\()]|\((?:\\.|[^\\()])*\))*\)|<[0-9A-Fa-f\s]*>|[^\](<])*)\]\s*TJ"
+    rb"|\((?P<literal>(?:\\.|[^\\()]|\((?:\\.|[^\\()])*\))*)\)"
+    rb"|(?<!<)<(?P<hex>[0-9A-Fa-f\s]*)>"
+    rb"|(?<![A-Za-z*])(?P<operator>BT|Tj|TD|Td|Tm|T\*)(?![A-Za-z*])"
+    rb"|(?P<quote>['\"])",
+    re.S,
+)
+RAW_ARRAY_STRING = re.compile(rb"\((?P<literal>(?:\\.|[^\\()]|\((?:\\.|[^\\()])*\))*)\)|<(?P<hex>[0-9A-Fa-f\s]*)>", re.S)
+RAW_ESCAPE = re.compile(rb"\\([0-7]{1,3}|\r\n|.)", re.S)
+RAW_ESCAPES = {b"n": b"\n", b"r": b"\r", b"t": b"\t", b"b": b"\b", b"f": b"\f", b"\r\n": b"", b"\n": b"", b"\r": b""}
+# Paginas de cada archivo en las que se compara el pre-escaneo con
+# extract_text antes de confiar en el
+RAW_CALIBRATION_PAGES = 3
+
+
+@lru_cache(maxsize=4096)
+def cuit_check_digit_ok(cuit):
+    # Digito verificador del CUIT/CUIL (modulo 11). Las paginas de una misma
+    # guia repiten el CUIT, por eso el resultado se memoriza
+    if len(cuit) != 11 or not cuit.isdigit():
+        return False
+    total = sum(map(mul, cuit.encode(), CUIT_WEIGHTS)) - 48 * CUIT_WEIGHTS_SUM
+    check = 11 - total % 11
+    if check == 11:
+        check = 0
+    elif check == 10:
+        check = 9
+    return check == int(cuit[10])
+
+
+def extract_cuit(text):
+    try:
+        if not text:
+            logger.debug("Advertencia: Texto vacío en la página. No se puede extraer CUIT.")
+            return None
+
+        # Camino rapido: sin la etiqueta no hace falta correr la regex, y con
+        # ella la regex se ancla en la etiqueta y no recorre toda la pagina
+        position = text.find(CUIT_LABEL)
+        while position != -1:
+            match = CUIT_PATTERN.match(text, position, position + CUIT_WINDOW)
+            if match:
+                cuit = "".join(match.group(2).split())
+                # Con el digito verificador mal se usa igual el CUIT impreso:
+                # descartarlo llevaba la guia a la carpeta de otro importador
+                if not cuit_check_digit_ok(cuit):
+                    logger.warning(f"Advertencia: CUIT {cuit} con dígito verificador inválido.")
+                return cuit
+            position = text.find(CUIT_LABEL, position + 1)
+        return None
+    except Exception as e:
+        logger.debug(f"Error: No se pudo extraer CUIT de la página. {e}")
+        return None
+
+
+def header_lines(text):
+    # Solo se separan las lineas hasta la del nro_guia; el resto de la pagina
+    # (la tabla de items) queda sin dividir en el ultimo elemento
+    return text.split("\n", NRO_GUIA_LINE + 1)
+
+
+def read_nro_guia(lines, page_number):
+    try:
+        text = lines
+        if len(text) >= NRO_GUIA_LINE:
+            line = text[NRO_GUIA_LINE].strip()
+            doc_transp = text[NRO_GUIA_LINE].split()[0]
+            remaining_text_on_line = line[len(doc_transp):].strip()
+
+            if remaining_text_on_line and remaining_text_on_line[0].isdigit():
+                doc_transp += remaining_text_on_line[0]
+                logger.debug(f"Doc_transp: {doc_transp}")
+                logger.debug(f"Remaining text: {remaining_text_on_line}")
+                logger.debug(f"Nro_guia: {doc_transp}")
+            return doc_transp
+        else:
+            logger.debug(f"Advertencia: La página {page_number + 1} no tiene suficientes líneas para extraer nro_guia.")
+            return None
+    except Exception as e:
+        logger.debug(f"Error: No se pudo extraer nro_guia de la página {page_number + 1}. {e}")
+        return None
+
+
+class _HeaderComplete(Exception):
+    pass
+
+
+def extract_header_text(page, max_runs=HEADER_MAX_RUNS):
+    # Extrae solo el comienzo del texto de la pagina: pypdf avisa cada
+    # fragmento al visitor y la extraccion se corta en cuanto estan completas
+    # las lineas hasta la del nro_guia y aparecio el CUIT, o tras max_runs
+    # fragmentos. Los fragmentos son un prefijo exacto del texto completo,
+    # asi la numeracion de lineas no cambia. No se filtra por posicion en la
+    # pagina porque eso renumeraria las lineas.
+    # pypdf descarta las excepciones que salen de visitor_text, por eso el
+    # corte se hace desde visitor_operand_before, antes del operador siguiente.
+    fragments = []
+    state = {"runs": 0, "newlines": 0, "complete": False}
+
+    def visitor_text(text, cm, tm, font, font_size):
+        if not text:
+            return
+        fragments.append(text)
+        state["runs"] += 1
+        newlines = text.count("\n")
+        if newlines:
+            state["newlines"] += newlines
+            if state["newlines"] > NRO_GUIA_LINE and extract_cuit("".join(fragments)):
+                state["complete"] = True
+        if state["runs"] >= max_runs:
+            state["complete"] = True
+
+    def visitor_operand_before(operator, operands, cm, tm):
+        if state["complete"]:
+            raise _HeaderComplete()
+
+    try:
+        text = page.extract_text(visitor_operand_before=visitor_operand_before,
+                                 visitor_text=visitor_text)
+        return text, True
+    except _HeaderComplete:
+        return "".join(fragments), False
+
+
+def _unescape_literal(literal):
+    def replace(match):
+        escape = match.group(1)
+        if escape[:1].isdigit():
+            return bytes((int(escape, 8) & 0xFF,))
+        return RAW_ESCAPES.get(escape, escape)
+    return RAW_ESCAPE.sub(replace, literal)
+
+
+def _raw_string(literal, hex_digits):
+    if literal is not None:
+        return _unescape_literal(literal)
+    hex_digits = b"".join(hex_digits.split())
+    if len(hex_digits) % 2:
+        hex_digits += b"0"
+    return bytes.fromhex(hex_digits.decode("ascii"))
+
+
+def scan_header_text(content):
+    # Reconstruye las primeras lineas de texto de la pagina leyendo los
+    # operadores del content stream ya descomprimido, sin el motor de layout
+    # de pypdf: cada operador de posicionamiento (BT, Td, TD, Tm, T*, ', ")
+    # entre dos textos empieza una linea nueva. Los bytes se leen como
+    # latin-1; con fuentes de codificacion propia el resultado no sirve y
+    # el llamador vuelve a extract_text.
+    lines = []
+    current = []
+    new_line = False
+    last_string = None
+
+    for match in RAW_TEXT_TOKEN.finditer(content):
+        kind = match.lastgroup
+        if kind == "literal" or kind == "hex":
+            last_string = _raw_string(match.group("literal"), match.group("hex"))
+            continue
+
+        if kind == "array":
+            shown = b"".join(
+                _raw_string(part.group("literal"), part.group("hex"))
+                for part in RAW_ARRAY_STRING.finditer(match.group("array")))
+        elif kind == "operator" and match.group("operator") == b"Tj":
+            shown = last_string
+        else:
+            # ' y " pasan de linea y muestran el string anterior
+            new_line = True
+            shown = last_string if kind == "quote" else None
+        last_string = None
+
+        if shown:
+            if new_line and current:
+                lines.append(b"".join(current))
+                current = []
+                if len(lines) > NRO_GUIA_LINE:
+                    break
+            new_line = False
+            current.append(shown)
+
+    if current and len(lines) <= NRO_GUIA_LINE:
+        lines.append(b"".join(current))
+    return "\n".join(line.decode("latin-1") for line in lines)
+
+
+class RawFieldScanner:
+    # Lee CUIT y nro_guia del content stream de cada pagina (ver
+    # scan_header_text). Es por archivo: en las primeras paginas el resultado
+    # se compara con el de extract_text y, si difiere, el pre-escaneo se
+    # desactiva para el resto del archivo. Despues solo sirve para reconocer
+    # paginas de una guia ya confirmada: un CUIT / nro_guia que no se vio
+    # (un posible cambio de guia) se confirma con extract_text, asi un
+    # pre-escaneo equivocado no llega a los nombres de carpeta y archivo.
+    # Devuelve None cuando no encuentra un CUIT y un nro_guia validos (caso
+    # ambiguo).
+
+    def __init__(self, calibration_pages=RAW_CALIBRATION_PAGES):
+        self.calibration_pages = calibration_pages
+        self.calibrated = 0
+        self.enabled = True
+        # (cuit, nro_guia) en que el pre-escaneo coincidio con extract_text
+        self.confirmed = set()
+
+    @property
+    def calibrating(self):
+        return self.calibrated < self.calibration_pages
+
+    def read(self, page, page_number):
+        try:
+            content = page.get_contents()
+            if content is None:
+                return None
+            text = scan_header_text(content.get_data())
+        except Exception as e:
+            logger.debug(f"Error: No se pudo pre-escanear la página {page_number + 1}. {e}")
+            return None
+
+        cuit = extract_cuit(text)
+        nro_guia = read_nro_guia(header_lines(text), page_number)
+        if not cuit or not nro_guia or not is_valid_nro_guia(nro_guia):
+            return None
+        return cuit, nro_guia
+
+    def trusted(self, raw_fields):
+        return not self.calibrating and raw_fields in self.confirmed
+
+    def calibrate(self, raw_fields, fields, page_number):
+        self.calibrated += 1
+        if raw_fields == fields:
+            self.confirmed.add(fields)
+        else:
+            self.enabled = False
+            logger.info(
+                f"Pre-escaneo desactivado: en la página {page_number + 1} da {raw_fields} "
+                f"y extract_text {fields}.")
+
+
+def is_valid_nro_guia(nro_guia):
+    return bool(NRO_GUIA_PATTERN.fullmatch(nro_guia)) and len(nro_guia) >= NRO_GUIA_MIN_LENGTH
+
+
+class FieldTimings:
+    # Acumula el tiempo de cada paso de extraccion (texto, cuit, nro_guia)
+    # para informar un resumen por archivo
+
+    def __init__(self):
+        self.seconds = {}
+        self.calls = {}
+        self.counters = {}
+        self._lock = threading.Lock()
+
+    def add(self, field, seconds):
+        with self._lock:
+            self.seconds[field] = self.seconds.get(field, 0.0) + seconds
+            self.calls[field] = self.calls.get(field, 0) + 1
+
+    def increment(self, counter):
+        with self._lock:
+            self.counters[counter] = self.counters.get(counter, 0) + 1
+
+    def state(self):
+        # Copia de los acumulados, para devolverlos desde otro proceso
+        with self._lock:
+            return dict(self.seconds), dict(self.calls), dict(self.counters)
+
+    def merge(self, state):
+        seconds, calls, counters = state
+        with self._lock:
+            for field, value in seconds.items():
+                self.seconds[field] = self.seconds.get(field, 0.0) + value
+                self.calls[field] = self.calls.get(field, 0) + calls[field]
+            for counter, count in counters.items():
+                self.counters[counter] = self.counters.get(counter, 0) + count
+
+    def measure(self, field, func, *args):
+        start = time.perf_counter()
+        result = func(*args)
+        self.add(field, time.perf_counter() - start)
+        return result
+
+    def summary(self):
+        with self._lock:
+            parts = [
+                f"{field}={self.seconds[field] * 1000:.1f} ms "
+                f"({self.seconds[field] * 1e6 / self.calls[field]:.0f} µs/página)"
+                for field in self.seconds
+            ]
+            parts.extend(f"{counter}={count}" for counter, count in self.counters.items())
+            return ", ".join(parts)
@@ -0,0 +1,116 @@
+import logging
+import os
+import queue
+import threading
+
+logger = logging.getLogger("dsi.jobs")
+
+# Estados posibles de un trabajo
+PENDING = "pendiente"
+RUNNING = "procesando"
+DONE = "finalizado"
+FAILED = "error"
+
+
+class JobQueue:
+    # Cola acotada de archivos a procesar con un pool de hilos trabajadores.
+    # Desacopla al observador de watchdog del procesamiento: submit() vuelve
+    # enseguida salvo que la cola este llena (contrapresion), y un mismo
+    # archivo nunca se procesa dos veces en paralelo.
+    # Solo se recuerdan los trabajos en cola, en proceso o con error: un
+    # trabajo finalizado se olvida, asi el servicio no acumula estados.
+
+    def __init__(self, process, workers=2, maxsize=32, on_status=None):
+        self._process = process
+        self._on_status = on_status
+        self._queue = queue.Queue(maxsize=maxsize)
+        self._status = {}
+        self._lock = threading.Lock()
+        self._threads = []
+
+        for number in range(workers):
+            thread = threading.Thread(
+                target=self._worker, name=f"dsi-worker-{number + 1}", daemon=True)
+            thread.start()
+            self._threads.append(thread)
+
+    @staticmethod
+    def _key(path):
+        return os.path.normcase(os.path.abspath(path))
+
+    def submit(self, path, timeout=None):
+        # Devuelve False si el archivo ya esta en cola o procesandose
+        key = self._key(path)
+        with self._lock:
+            if self._status.get(key) in (PENDING, RUNNING):
+                return False
+            self._status[key] = PENDING
+        self._notify(path, PENDING)
+
+        try:
+            # Bloquea mientras la cola este llena
+            self._queue.put((key, path), timeout=timeout)
+        except queue.Full:
+            with self._lock:
+                del self._status[key]
+            return False
+
+        return True
+
+    def status(self, path):
+        with self._lock:
+            return self._status.get(self._key(path))
+
+    def snapshot(self):
+        with self._lock:
+            return dict(self._status)
+
+    def forget(self, path):
+        # Olvida un trabajo con error (el archivo ya no esta en input_pdf)
+        key = self._key(path)
+        with self._lock:
+            if self._status.get(key) == FAILED:
+                del self._status[key]
+
+    def is_full(self):
+        return self._queue.full()
+
+    def join(self):
+        # Espera a que se procesen todos los trabajos encolados
+        self._queue.join()
+
+    def stop(self):
+        for _ in self._threads:
+            self._queue.put(None)
+        for thread in self._threads:
+            thread.join()
+
+    def _set_status(self, key, path, status):
+        with self._lock:
+            if status == DONE:
+                self._status.pop(key, None)
+            else:
+                self._status[key] = status
+        self._notify(path, status)
+
+    def _notify(self, path, status):
+        if self._on_status:
+            self._on_status(path, status)
+
+    def _worker(self):
+        while True:
+            job = self._queue.get()
+            if job is None:
+                self._queue.task_done()
+                return
+
+            key, path = job
+            self._set_status(key, path, RUNNING)
+            try:
+                ok = self._process(path)
+                self._set_status(key, path, FAILED if ok is False else DONE)
+            except Exception:
+                logger.exception(f"Error inesperado al procesar {path}")
+                self._set_status(key, path, FAILED)
+            finally:
+                self._queue.task_done()
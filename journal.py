@@ -0,0 +1,79 @@
+import json
+import logging
+import os
+import threading
+
+logger = logging.getLogger("dsi.journal")
+
+
+def block_key(block):
+    return (block.cuit, block.nro_guia, block.start, block.end)
+
+
+class BlockJournal:
+    # Registro (una linea JSON por bloque) de los bloques de un archivo de
+    # entrada que ya se guardaron en la carpeta de salida. Cada linea se
+    # escribe y se sincroniza en disco apenas el writer confirma el bloque,
+    # asi si la aplicacion se cae a mitad del archivo el siguiente intento
+    # omite los bloques ya guardados y no los vuelve a escribir.
+    # Se borra cuando el archivo termina y se mueve a PROCESADOS.
+
+    def __init__(self, path):
+        self.path = path
+        self.done = {}
+        self._lock = threading.Lock()
+        os.makedirs(os.path.dirname(path) or ".", exist_ok=True)
+        self._load()
+        self._file = open(path, "a", encoding="utf-8")
+
+    def _load(self):
+        try:
+            with open(self.path, encoding="utf-8") as journal_file:
+                for line in journal_file:
+                    try:
+                        entry = json.loads(line)
+                    except ValueError:
+                        # Ultima linea cortada por una caida: ese bloque se rehace
+                        continue
+                    key = (entry["cuit"], entry["nro_guia"], entry["start"], entry["end"])
+                    self.done[key] = entry["sha256"]
+        except FileNotFoundError:
+            pass
+
+    def is_done(self, block):
+        with self._lock:
+            return block_key(block) in self.done
+
+    def record(self, block, digest):
+        entry = {
+            "cuit": block.cuit,
+            "nro_guia": block.nro_guia,
+            "start": block.start,
+            "end": block.end,
+            "sha256": digest,
+        }
+        with self._lock:
+            if self._file.closed:
+                # No deberia pasar: el archivo espera sus escrituras antes de
+                # cerrar el registro. El bloque se rehace en el proximo intento
+                logger.warning(f"Advertencia: Registro {self.path} ya cerrado, no se anota el bloque "
+                               f"CUIT={block.cuit}, nro_guia={block.nro_guia}.")
+                return
+            self._file.write(json.dumps(entry) + "\n")
+            self._file.flush()
+            os.fsync(self._file.fileno())
+            self.done[block_key(block)] = digest
+
+    def close(self):
+        with self._lock:
+            self._file.close()
+
+    def discard(self):
+        self.close()
+        try:
+            os.remove(self.path)
+        except FileNotFoundError:
+            # Otro archivo de igual contenido comparte el registro y ya lo borro
+            pass
+        except OSError as e:
+            logger.warning(f"Advertencia: No se pudo borrar el registro {self.path}. {e}")
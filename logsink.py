@@ -0,0 +1,74 @@
+import logging
+import logging.handlers
+import os
+import queue
+
+LOG_FILE_NAME = "dsi_processor.log"
+LOG_FILE_MAX_BYTES = 5 * 1024 * 1024
+LOG_FILE_BACKUPS = 5
+
+
+class TkLogSink(logging.Handler):
+    # Handler de logging para el ScrolledText de la interfaz. Tkinter no es
+    # thread-safe: los hilos de trabajo solo encolan el mensaje y el mainloop
+    # de Tk lo vuelca cada interval_ms, de a lotes de batch_size lineas y con
+    # un unico insert por lote. El widget conserva como maximo max_lines.
+
+    def __init__(self, widget, max_lines=5000, batch_size=1000, interval_ms=100):
+        super().__init__()
+        self.widget = widget
+        self.max_lines = max_lines
+        self.batch_size = batch_size
+        self.interval_ms = interval_ms
+        self._queue = queue.SimpleQueue()
+        self.setFormatter(logging.Formatter("%(message)s"))
+        widget.after(interval_ms, self._drain)
+
+    def emit(self, record):
+        try:
+            self._queue.put(self.format(record))
+        except Exception:
+            self.handleError(record)
+
+    def _drain(self):
+        lines = []
+        try:
+            while len(lines) < self.batch_size:
+                lines.append(self._queue.get_nowait())
+        except queue.Empty:
+            pass
+
+        if lines:
+            self.widget.insert("end", "\n".join(lines) + "\n")
+            # Descartar las lineas mas viejas para que el widget no crezca
+            line_count = int(self.widget.index("end-1c").split(".")[0]) - 1
+            if line_count > self.max_lines:
+                self.widget.delete("1.0", f"{line_count - self.max_lines + 1}.0")
+            self.widget.see("end")
+
+        self.widget.after(self.interval_ms, self._drain)
+
+
+def setup_logging(log_directory, console=False, level=logging.INFO):
+    # Configura el logger "dsi": archivo rotativo en log_directory y,
+    # opcionalmente, salida por consola
+    logger = logging.getLogger("dsi")
+    logger.setLevel(level)
+
+    os.makedirs(log_directory, exist_ok=True)
+    file_handler = logging.handlers.RotatingFileHandler(
+        os.path.join(log_directory, LOG_FILE_NAME),
+        maxBytes=LOG_FILE_MAX_BYTES,
+        backupCount=LOG_FILE_BACKUPS,
+        encoding="utf-8",
+    )
+    file_handler.setFormatter(logging.Formatter(
+        "%(asctime)s %(levelname)s [%(threadName)s] %(message)s"))
+    logger.addHandler(file_handler)
+
+    if console:
+        console_handler = logging.StreamHandler()
+        console_handler.setFormatter(logging.Formatter("%(asctime)s %(message)s"))
+        logger.addHandler(console_handler)
+
+    return logger
@@ -1,29 +1,39 @@
-from pypdf import PdfReader, PdfWriter
+from pypdf import PageObject, PdfReader, PdfWriter
+from pypdf.filters import ASCII85Decode
+from pypdf.generic import ArrayObject, DictionaryObject, IndirectObject, NameObject, StreamObject
 from reportlab.pdfgen import canvas
 from reportlab.lib.pagesizes import letter
 from PIL import Image
 from watchdog.observers import Observer
 from watchdog.events import FileSystemEventHandler
+import dataclasses
+import hashlib
 import io
-import re
 import os
 import time
-import tkinter as tk
-from tkinter.scrolledtext import ScrolledText
 import threading
+import logging
+from concurrent.futures import ProcessPoolExecutor
+import multiprocessing
 import shutil
 import sys
+import argparse
 from pathlib import Path
-
-def ensure_output_directory(base_path, cuit_code, log_output):
-    directory = os.path.join(base_path, cuit_code)
-    try:
-        os.makedirs(directory, exist_ok=True)
-    except OSError as e:
-        log_output.insert(tk.END, f"Error al crear el directorio {directory}: {e}\n")
-        log_output.see(tk.END)
-        return None
-    return directory
+from contextlib import contextmanager
+from dataclasses import dataclass
+from jobs import JobQueue, PENDING, RUNNING, FAILED
+from readiness import wait_until_ready
+from output_writer import OutputManifest, OutputWriter
+from pagecache import PageCache, file_content_hash
+from journal import BlockJournal
+from mappedfile import MappedFile
+from pdfdedupe import add_pages_deduped
+from boundaries import search_boundaries, verify_boundaries
+import metrics
+from profiling import request_profile, run_profiled, take_profile_request
+from logsink import TkLogSink, setup_logging
+from fields import (FieldTimings, RawFieldScanner, extract_cuit, extract_header_text,
+                    header_lines, is_valid_nro_guia, read_nro_guia)
 
 if getattr(sys, 'frozen', False):
     # El archivo está empaquetado con PyInstaller
@@ -34,220 +44,915 @@ else:
 
 # Define el directorio a observar
 WATCH_DIRECTORY = os.path.join(base_directory, "input_pdf")
-SIGNATURE_IMAGE = os.path.join(base_directory, "signature", "firma.JPEG")
+SIGNATURE_IMAGE = os.environ.get(
+    "DSI_SIGNATURE_IMAGE", os.path.join(base_directory, "signature", "firma.jpeg"))
+# Carpeta de salida; se puede apuntar a una carpeta local para pruebas
+OUTPUT_DIRECTORY = os.environ.get("DSI_OUTPUT_DIRECTORY", "\\\\10.55.55.9\\particulares")
 
-def extract_text_from_all_pages(pdf_file_path):
-    reader = PdfReader(pdf_file_path)
-    all_text = [page.extract_text() for page in reader.pages]
-    return all_text
+# Cantidad de procesos para estampar y guardar los bloques de un archivo.
+# Con 1 todo se hace en el hilo del observador, como antes
+PROCESS_WORKERS = int(os.environ.get("DSI_PROCESS_WORKERS", os.cpu_count() or 1))
+# Por debajo de esta cantidad de paginas no compensa levantar procesos
+PARALLEL_MIN_PAGES = 200
 
-def extract_cuit_pdf(page):
-    try:
-        # Leer el PDF
-        text = page.extract_text()
-        if not text:
-            print(f"Advertencia: Texto vacío en la página. No se puede extraer CUIT.")
-            return None
-        
-        match = re.search(r'(CUIT|CUIL)\s*-\s*(\d+\s*\d*)', text)
-        if match:
-            cuit = match.group(2).replace(" ", "")
-            return cuit
-        return None
-    except Exception as e:
-        print(f"Error: No se pudo extraer CUIT de la página. {e}")
-        return None
+# Con el pool activo, la primera pasada (CUIT / nro_guia de cada pagina)
+# tambien se reparte en tramos de paginas entre los procesos
+PARALLEL_ANALYSIS = True
+ANALYSIS_RANGES_PER_WORKER = 4
+ANALYSIS_MIN_RANGE_PAGES = 50
+# Los bloques se estampan en el pool en lotes de bloques consecutivos
+BLOCK_BATCHES_PER_WORKER = 4
+BLOCK_BATCH_MIN_PAGES = 50
+# Lotes en vuelo por proceso: limita los bloques serializados que esperan en
+# memoria a que el proceso principal los entregue al writer
+BLOCK_BATCHES_INFLIGHT_PER_WORKER = 2
+
+# Bloques desde esta cantidad de paginas se guardan con una sola copia de
+# cada fuente / XObject repetido; 0 lo desactiva
+BLOCK_DEDUPE_MIN_PAGES = 20
+
+# Lectura del PDF a demanda desde el archivo mapeado en memoria, descartando
+# los objetos ya leidos cada STREAM_CACHE_OBJECTS; con False se copia el
+# archivo entero a la memoria del proceso
+STREAMING = True
+STREAM_CACHE_OBJECTS = 500
+
+# Extraer solo la cabecera de cada pagina (hasta la linea del nro_guia y el
+# CUIT); si falta alguno de los dos se extrae la pagina completa
+HEADER_ONLY = True
+
+# Leer CUIT y nro_guia directo de los operadores de texto del content stream
+# y usar extract_text solo si el resultado es ambiguo
+RAW_PRESCAN = True
+
+# Buscar los cambios de guia al galope y con busqueda binaria en lugar de
+# analizar todas las paginas; con BOUNDARY_VERIFY se analizan todas igual y
+# se informan las diferencias con la busqueda
+BOUNDARY_SEARCH = True
+BOUNDARY_VERIFY = False
+
+# Cache en disco de CUIT/nro_guia por pagina, para no volver a extraer el
+# texto si un archivo identico se procesa de nuevo
+PAGE_CACHE = True
+PAGE_CACHE_PATH = os.path.join(base_directory, "cache", "paginas.sqlite")
+PAGE_CACHE_MAX_BYTES = 32 * 1024 * 1024
+
+# Registro por archivo de los bloques ya guardados, para retomar un archivo
+# interrumpido sin volver a escribir sus bloques
+JOURNAL_DIRECTORY = os.path.join(base_directory, "journal")
+
+# Archivos que se procesan a la vez y tamano maximo de la cola de espera
+JOB_WORKERS = int(os.environ.get("DSI_JOB_WORKERS", 2))
+JOB_QUEUE_SIZE = 32
+# Escritura en el recurso compartido: hilos, bytes pendientes y reintentos
+OUTPUT_WRITERS = 4
+OUTPUT_MAX_INFLIGHT_BYTES = 64 * 1024 * 1024
+OUTPUT_RETRIES = 3
+# Tamano y hash de lo ya guardado, para no reescribir bloques sin cambios
+OUTPUT_MANIFEST_PATH = os.path.join(base_directory, "cache", "salidas.sqlite")
+# Segundos maximos de espera a que un archivo termine de copiarse
+READY_TIMEOUT = 600
+# Segundos entre barridos de input_pdf por si watchdog perdio eventos
+RECONCILE_INTERVAL = 60
+
+# Puerto local donde se publican las metricas (formato Prometheus); con 0 las
+# metricas quedan desactivadas
+METRICS_PORT = int(os.environ.get("DSI_METRICS_PORT", 0))
+
+# Log en archivo rotativo y lineas maximas que conserva la ventana
+LOG_DIRECTORY = os.path.join(base_directory, "logs")
+LOG_MAX_LINES = 5000
+
+logger = logging.getLogger("dsi")
+
+@dataclass
+class PageRecord:
+    # Resultado del analisis de una pagina: el texto se extrae una sola vez
+    index: int
+    text: str
+    # Lineas de la cabecera hasta la del nro_guia; el resto queda al final
+    lines: list
+    cuit: str = None
+    nro_guia: str = None
+
+def analyze_page(page, page_number, timings=None, scanner=None):
+    # Extraer el texto una unica vez y derivar de el CUIT y nro_guia
+    timings = timings or FieldTimings()
+
+    # Pre-escaneo del content stream; extract_text solo corre si es ambiguo,
+    # mientras se calibra o para confirmar una guia que el pre-escaneo no
+    # habia visto
+    raw_fields = None
+    if scanner and scanner.enabled:
+        raw_fields = timings.measure("preescaneo", scanner.read, page, page_number)
+        if raw_fields is None:
+            timings.increment("ambiguas")
+        elif scanner.trusted(raw_fields):
+            cuit, nro_guia = raw_fields
+            return PageRecord(index=page_number, text=None, lines=None, cuit=cuit, nro_guia=nro_guia)
+
+    if HEADER_ONLY:
+        text, complete = timings.measure("texto", extract_header_text, page)
+    else:
+        text, complete = timings.measure("texto", page.extract_text), True
+    lines = header_lines(text)
+    cuit = timings.measure("cuit", extract_cuit, text)
+    nro_guia = timings.measure("nro_guia", read_nro_guia, lines, page_number)
+
+    if not complete and not (cuit and nro_guia):
+        # La cabecera no alcanzo: se repite con el texto completo de la pagina
+        timings.increment("respaldo")
+        text = timings.measure("texto", page.extract_text)
+        lines = header_lines(text)
+        cuit = timings.measure("cuit", extract_cuit, text)
+        nro_guia = timings.measure("nro_guia", read_nro_guia, lines, page_number)
+
+    if raw_fields is not None:
+        scanner.calibrate(raw_fields, (cuit, nro_guia), page_number)
+
+    return PageRecord(
+        index=page_number,
+        text=text,
+        lines=lines,
+        cuit=cuit,
+        nro_guia=nro_guia,
+    )
+
+def release_reader_cache(reader):
+    # pypdf conserva todos los objetos que ya leyo del archivo; en modo
+    # streaming se descartan al pasar el limite y se vuelven a leer a demanda,
+    # asi la memoria no crece con la cantidad de paginas
+    if STREAMING and len(reader.resolved_objects) > STREAM_CACHE_OBJECTS:
+        reader.resolved_objects.clear()
+
+def analyze_page_number(reader, page_num, timings=None, cached_file=None, scanner=None, pages=None):
+    # Las paginas que ya estan en la cache no se leen del PDF
+    entry = cached_file.get(page_num) if cached_file else None
+    if entry is not None:
+        cuit, nro_guia = entry
+        return PageRecord(index=page_num, text=None, lines=None, cuit=cuit, nro_guia=nro_guia)
+
+    with metrics.stage("extraer"):
+        page = (reader.pages if pages is None else pages)[page_num]
+        record = analyze_page(page, page_num, timings, scanner)
+    if cached_file:
+        cached_file.put(page_num, record.cuit, record.nro_guia)
+    release_reader_cache(reader)
+    return record
+
+def analyze_pages(reader, total_pages, timings=None, cached_file=None, first_page=0, pages=None,
+                  scanner=None):
+    # Generador: las paginas [first_page, total_pages) se analizan a medida
+    # que se consumen; pages reemplaza a reader.pages y scanner es un
+    # pre-escaneo ya calibrado para el archivo
+    if scanner is None and RAW_PRESCAN:
+        scanner = RawFieldScanner()
+
+    def analyze(page_num):
+        return analyze_page_number(reader, page_num, timings, cached_file, scanner, pages)
+
+    exhaustive = (analyze(page_num) for page_num in range(first_page, total_pages))
+    if not BOUNDARY_SEARCH:
+        yield from exhaustive
+        return
+
+    on_inferred = (lambda: timings.increment("inferidas")) if timings else None
+    records = search_boundaries(analyze, total_pages, on_inferred, start=first_page)
+    if BOUNDARY_VERIFY:
+        records = verify_boundaries(records, exhaustive)
+    yield from records
+
+def analysis_ranges(first_page, total_pages, workers):
+    # Tramos [start, end) para el pool: algunos por proceso, para repartir
+    # mejor los tramos lentos, pero no tan chicos que cada uno se pierda en
+    # abrir el PDF
+    size = -(-(total_pages - first_page) // (workers * ANALYSIS_RANGES_PER_WORKER))
+    size = max(size, ANALYSIS_MIN_RANGE_PAGES)
+    return [(start, min(start + size, total_pages)) for start in range(first_page, total_pages, size)]
+
+# Atributos que una pagina hereda de los nodos /Pages si no los tiene
+INHERITABLE_PAGE_ATTRIBUTES = ("/Resources", "/MediaBox", "/CropBox", "/Rotate")
+
+def page_references(reader, start, end):
+    # Referencias (idnum, generacion) de las paginas [start, end), para
+    # leerlas en otro proceso con ReferencedPages
+    return [
+        (page.indirect_reference.idnum, page.indirect_reference.generation)
+        for page in reader.pages[start:end]
+    ]
+
+class ReferencedPages:
+    # Paginas [first_page, ...) de un reader leidas por su referencia. Con
+    # reader.pages pypdf lee primero el arbol de paginas entero, y en cada
+    # tramo de la primera pasada eso costaba mas que analizar sus paginas
+    def __init__(self, reader, references, first_page=0):
+        self.reader = reader
+        self.references = references
+        self.first_page = first_page
+
+    def __getitem__(self, page_num):
+        idnum, generation = self.references[page_num - self.first_page]
+        reference = IndirectObject(idnum, generation, self.reader)
+        page = PageObject(self.reader, reference)
+        page.update(reference.get_object())
+        node = page.get("/Parent")
+        while node is not None:
+            node = node.get_object()
+            for attribute in INHERITABLE_PAGE_ATTRIBUTES:
+                if attribute not in page and attribute in node:
+                    page[NameObject(attribute)] = node[attribute]
+            node = node.get("/Parent")
+        return page
+
+def analyze_range_job(pdf_file_path, start, end, references, cached_file, scanner, log_level):
+    # Analiza en un proceso del pool las paginas [start, end). El archivo se
+    # mapea en memoria: las paginas se leen del cache del sistema operativo,
+    # compartido por todos los procesos, sin copiar el PDF en cada uno. El
+    # mapa se cierra al terminar el tramo para no retener el archivo, que
+    # despues se mueve a PROCESADOS
+    timings = FieldTimings()
+    log = LogBuffer()
+    started = time.perf_counter()
+    with log.capture(log_level), MappedFile(pdf_file_path) as mapped:
+        reader = PdfReader(mapped.buffer)
+        pages = ReferencedPages(reader, references, start)
+        # Solo CUIT y nro_guia vuelven al proceso principal, cada registro con
+        # la cantidad de mensajes emitidos hasta entregarlo
+        records = [
+            (dataclasses.replace(record, text=None, lines=None), len(log.records))
+            for record in analyze_pages(reader, end, timings, cached_file, first_page=start, pages=pages,
+                                        scanner=scanner)
+        ]
+        del reader, pages
+    return records, log.records, cached_file, timings.state(), time.perf_counter() - started
 
-def read_nro_guia(all_text, page_number):
+def analyze_pages_parallel(reader, pdf_file_path, total_pages, timings=None, cached_file=None, workers=None,
+                           log=None):
+    # Primera pasada repartida en tramos entre los procesos del pool; los
+    # resultados se entregan en el orden de las paginas, como analyze_pages.
+    # Los mensajes de los tramos van a log (un LogBuffer) si se indica
+    # Las primeras paginas se analizan aca y calibran el pre-escaneo una
+    # sola vez; cada tramo recibe una copia del resultado
+    scanner = RawFieldScanner() if RAW_PRESCAN else None
+    first_page = min(scanner.calibration_pages if scanner else 0, total_pages)
+    first_records = [
+        analyze_page_number(reader, page_num, timings, cached_file, scanner)
+        for page_num in range(first_page)
+    ]
+
+    pool = get_process_pool()
+    log_level = logger.getEffectiveLevel()
+    futures = [
+        pool.submit(analyze_range_job, pdf_file_path, start, end, page_references(reader, start, end),
+                    cached_file.detached(start, end) if cached_file else None, scanner, log_level)
+        for start, end in analysis_ranges(first_page, total_pages, workers or PROCESS_WORKERS)
+    ]
     try:
-        text = all_text[page_number].split("\n")
-        if len(text) >= 10:
-            line = text[10].strip()
-            doc_transp = text[10].split()[0]
-            remaining_text_on_line = line[len(doc_transp):].strip()
-            
-            if remaining_text_on_line and remaining_text_on_line[0].isdigit():
-                doc_transp += remaining_text_on_line[0]
-                print(f"Doc_transp: {doc_transp}")
-                print(f"Remaining text: {remaining_text_on_line}")
-                print(f"Nro_guia: {doc_transp}")
-            return doc_transp
-        else:
-            print(f"Advertencia: La página {page_number + 1} no tiene suficientes líneas para extraer nro_guia.")
-            return None
-    except Exception as e:
-        print(f"Error: No se pudo extraer nro_guia de la página {page_number + 1}. {e}")
-        return None
+        yield from first_records
+        for future in futures:
+            records, log_records, range_cache, timings_state, seconds = future.result()
+            # El tiempo es de todo el tramo, no de una pagina: va en su propio
+            # histograma para no mezclarse con el de "extraer"
+            metrics.observe("extraer_tramo", seconds)
+            if timings:
+                timings.merge(timings_state)
+            if cached_file:
+                cached_file.merge(range_cache)
+            # Los mensajes del tramo se reproducen antes de la pagina que los
+            # emitio, en el mismo orden que el camino secuencial
+            range_log = LogBuffer()
+            range_log.records = log_records
+            logged = 0
+            for record, log_position in records:
+                range_log.replay(logged, log_position, log)
+                logged = log_position
+                yield record
+            range_log.replay(logged, into=log)
+    finally:
+        # Si el consumidor se detiene (error), los tramos pendientes no corren
+        for future in futures:
+            future.cancel()
+
+# Firma ya convertida a Image XObject: firma -> (mtime, xobject, ancho, alto)
+_signature_images = {}
+# Operadores que dibujan la firma, por (firma, geometria de pagina)
+_signature_stamps = {}
+_signature_lock = threading.Lock()
 
-def add_signature_to_page(page, image_path, img):
-    # Crear un archivo en blanco con las mismas configuraciones de la página original
+# Nombre del XObject de la firma en los recursos de la pagina
+SIGNATURE_XOBJECT_NAME = "/Sig"
+
+# Geometria de una pagina carta sin rotar, la unica que se usaba antes
+LETTER_GEOMETRY = (0.0, 0.0, float(letter[0]), float(letter[1]), 0)
+
+def page_geometry(page):
+    # Origen y tamano del mediabox y rotacion de la pagina; las paginas con la
+    # misma geometria comparten los operadores de la firma
+    box = page.mediabox
+    return (
+        round(float(box.left), 2),
+        round(float(box.bottom), 2),
+        round(float(box.width), 2),
+        round(float(box.height), 2),
+        page.rotation % 360,
+    )
+
+def render_signature_image(image_path):
+    # reportlab convierte la imagen (JPEG, PNG con transparencia, ...) en un
+    # Image XObject; se toma de una pagina de un solo dibujo
     packet = io.BytesIO()
-    can = canvas.Canvas(packet, pagesize=letter)
+    can = canvas.Canvas(packet)
+    with Image.open(image_path) as img:
+        img_width, img_height = img.size
+    can.drawImage(image_path, 0, 0, width=img_width, height=img_height)
+    can.save()
 
-    # Obteniendo tamano de la pagina para centrar la firma
-    page_width, page_height = letter
-    img_width, img_height = img.size
+    page = PdfReader(io.BytesIO(packet.getvalue())).pages[0]
+    for xobject in page["/Resources"]["/XObject"].values():
+        xobject = xobject.get_object()
+        if xobject.get("/Subtype") == "/Image":
+            break
+    else:
+        raise ValueError(f"No se pudo convertir la firma {image_path} en imagen PDF")
+
+    # reportlab agrega una capa ASCII85 que solo agranda la imagen
+    filters = xobject.get("/Filter")
+    if isinstance(filters, ArrayObject) and filters and filters[0] == "/ASCII85Decode":
+        image = StreamObject()
+        image.update({key: value for key, value in xobject.items() if key not in ("/Filter", "/Length")})
+        image[NameObject("/Filter")] = ArrayObject(filters[1:]) if len(filters) > 2 else filters[1]
+        image.set_data(ASCII85Decode.decode(xobject._data))
+        xobject = image
+        # Con una referencia indirecta propia, clone() agrega la imagen una
+        # sola vez a cada archivo de salida
+        PdfWriter()._add_object(xobject)
+    return xobject, img_width, img_height
+
+def get_signature_image(image_path):
+    # Se convierte una sola vez por firma; si el archivo de la firma cambia
+    # (mtime distinto) se vuelve a generar
+    key = os.path.abspath(image_path)
+    mtime = os.path.getmtime(image_path)
+    cached = _signature_images.get(key)
+    if cached and cached[0] == mtime:
+        return cached[1:]
+
+    xobject, img_width, img_height = render_signature_image(image_path)
+    _signature_images[key] = (mtime, xobject, img_width, img_height)
+    return xobject, img_width, img_height
+
+def multiply_matrices(first, second):
+    a1, b1, c1, d1, e1, f1 = first
+    a2, b2, c2, d2, e2, f2 = second
+    return (
+        a1 * a2 + b1 * c2, a1 * b2 + b1 * d2,
+        c1 * a2 + d1 * c2, c1 * b2 + d1 * d2,
+        e1 * a2 + f1 * c2 + e2, e1 * b2 + f1 * d2 + f2,
+    )
+
+def signature_matrix(geometry, img_width, img_height):
+    left, bottom, page_width, page_height, rotation = geometry
+
+    # La posicion se calcula sobre la pagina tal como se ve: con rotacion de
+    # 90 o 270 grados el ancho y el alto visibles se intercambian
+    if rotation in (90, 270):
+        visible_width, visible_height = page_height, page_width
+    else:
+        visible_width, visible_height = page_width, page_height
 
     # Calculando x e y para centrar la firma
-    x = (page_width - img_width) / 13
-    y = (page_height - img_height) / 13
+    x = (visible_width - img_width) / 13
+    y = (visible_height - img_height) / 13
 
-    # Dibujando la firma en el centro de la pagina
-    can.drawImage(image_path, x, y, width=img_width, height=img_height)
-    can.save()
+    # Llevar las coordenadas visibles al espacio de la pagina: origen del
+    # mediabox y giro inverso al /Rotate, asi la firma queda derecha
+    to_page = {
+        0: (1, 0, 0, 1, left, bottom),
+        90: (0, 1, -1, 0, left + page_width, bottom),
+        180: (-1, 0, 0, -1, left + page_width, bottom + page_height),
+        270: (0, -1, 1, 0, left, bottom + page_height),
+    }[rotation]
+    return multiply_matrices((img_width, 0, 0, img_height, x, y), to_page)
+
+def get_signature_stamp(image_path, geometry):
+    # Devuelve el XObject de la firma y la matriz "a b c d e f" que la ubica
+    # en una pagina de esa geometria
+    key = (os.path.abspath(image_path), geometry)
+    xobject, img_width, img_height = get_signature_image(image_path)
+    cached = _signature_stamps.get(key)
+    if cached and cached[0] is xobject:
+        return xobject, cached[1]
+
+    matrix = " ".join(
+        f"{value:.4f}".rstrip("0").rstrip(".")
+        for value in signature_matrix(geometry, img_width, img_height)
+    )
+    _signature_stamps[key] = (xobject, matrix)
+    return xobject, matrix
 
-    # Moviendo el archivo en blanco a la pagina extraida
-    packet.seek(0)
-    new_pdf = PdfReader(packet)
-    page.merge_page(new_pdf.pages[0])
+def add_content_stream(writer, data):
+    stream = StreamObject()
+    stream.set_data(data)
+    return writer._add_object(stream)
+
+def add_signature_to_page(page, image_path):
+    # Estampa la firma sin reescribir la pagina: la imagen se agrega una vez
+    # al archivo de salida como XObject y a la pagina solo se le suman dos
+    # streams chicos alrededor de su contenido ("q" antes y "Q q ... cm /Sig
+    # Do Q" despues). La pagina tiene que pertenecer a un PdfWriter.
+    writer = page.indirect_reference.pdf
+    geometry = page_geometry(page)
+
+    # La imagen se comparte entre hilos, se clona al writer bajo el lock
+    with _signature_lock:
+        xobject, matrix = get_signature_stamp(image_path, geometry)
+        image_reference = xobject.clone(writer).indirect_reference
+
+    resources = page.setdefault(NameObject("/Resources"), DictionaryObject()).get_object()
+    xobjects = resources.setdefault(NameObject("/XObject"), DictionaryObject()).get_object()
+    # Si la pagina ya usa el nombre para otro XObject se elige otro
+    name = SIGNATURE_XOBJECT_NAME
+    number = 0
+    while name in xobjects and xobjects[name] != image_reference:
+        number += 1
+        name = f"{SIGNATURE_XOBJECT_NAME}{number}"
+    xobjects[NameObject(name)] = image_reference
+    # El contenido original queda aislado entre q y Q, asi su estado grafico
+    # no mueve la firma
+    stamp = f"Q\nq {matrix} cm {name} Do Q\n".encode("ascii")
+
+    contents = page.get("/Contents")
+    if contents is None:
+        original = []
+    elif isinstance(contents.get_object(), ArrayObject):
+        original = list(contents.get_object())
+    else:
+        original = [contents if isinstance(contents, IndirectObject) else writer._add_object(contents)]
+    page[NameObject("/Contents")] = ArrayObject(
+        [add_content_stream(writer, b"q\n"), *original, add_content_stream(writer, stamp)])
 
     return page
 
-def split_pdf_add_img(pdf_file_path, image_path, log_output):
-    try:
-        time.sleep(1)
-        reader = PdfReader(pdf_file_path)
+@dataclass
+class PageBlock:
+    # Paginas consecutivas [start, end) de una misma guia
+    cuit: str
+    nro_guia: str
+    start: int
+    end: int
+
+class LogBuffer:
+    # Acumula mensajes con la interfaz del logger, para reenviarlos en orden
+    # cuando el trabajo se hace en otro proceso
+    def __init__(self):
+        self.records = []
+
+    def log(self, level, message, name=None):
+        self.records.append((name, level, message))
+
+    def info(self, message):
+        self.log(logging.INFO, message)
+
+    def warning(self, message):
+        self.log(logging.WARNING, message)
 
-        # Leer la firma
-        img = Image.open(image_path)
+    def error(self, message):
+        self.log(logging.ERROR, message)
 
-        # Variables para el proceso de agrupacion de paginas por CUIT
-        current_cuit_code = None
-        current_nro_guia = None
-        pages_buffer = []
-        all_text = extract_text_from_all_pages(pdf_file_path)
+    def replay(self, start, end=None, into=None):
+        # Cada mensaje vuelve al logger que lo emitio (dsi.fields, ...) o,
+        # con into, se agrega a otro LogBuffer
+        if into is not None:
+            into.records.extend(self.records[start:end])
+            return
+        for name, level, message in self.records[start:end]:
+            (logging.getLogger(name) if name else logger).log(level, message)
+
+    @contextmanager
+    def capture(self, level):
+        # En un proceso del pool: los mensajes de los loggers "dsi" se
+        # acumulan aca en lugar de ir a los handlers del proceso, con el
+        # nivel del proceso principal
+        target = logging.getLogger("dsi")
+        saved = target.handlers[:], target.level, target.propagate
+        target.handlers[:] = [_LogBufferHandler(self)]
+        target.setLevel(level)
+        target.propagate = False
+        try:
+            yield self
+        finally:
+            target.handlers[:], level, target.propagate = saved
+            target.setLevel(level)
+
+class _LogBufferHandler(logging.Handler):
+    def __init__(self, buffer):
+        super().__init__()
+        self.buffer = buffer
+
+    def emit(self, record):
+        self.buffer.log(record.levelno, record.getMessage(), record.name)
+
+def iter_blocks(records, log=logger):
+    # Agrupa las paginas analizadas por CUIT / nro_guia y entrega cada bloque
+    # apenas se detecta el cambio de guia
+    current_cuit_code = None
+    current_nro_guia = None
+    block_start = None
+
+    for record in records:
+        page_num = record.index
+        cuit_code = record.cuit
+        nro_guia = record.nro_guia
         
-        # Ignorando la ultima hoja (resumen de DSI)
-        total_pages = len(reader.pages) - 1
+        if nro_guia and not is_valid_nro_guia(nro_guia):
+            log.warning(f"Advertencia: nro_guia con formato inválido en la página {page_num + 1}. Usando nro_guia del bloque actual.")
+            nro_guia = current_nro_guia
         
-        for page_num in range(total_pages):
-            page = reader.pages[page_num]
-            cuit_code = extract_cuit_pdf(page)
-            nro_guia = read_nro_guia(all_text, page_num)
-            
-            if nro_guia and (not re.match(r'^(AF\d+|CI\d+|\d+)$', nro_guia) or len(nro_guia) < 5):
-                log_output.insert(tk.END, f"Advertencia: nro_guia con formato inválido en la página {page_num + 1}. Usando nro_guia del bloque actual.\n")
-                nro_guia = current_nro_guia
-            
-            # Validar CUIT
-            if not cuit_code:
-                log_output.insert(tk.END, f"Error: CUIT no válido para la página {page_num + 1}. Se omitirá esta página.\n")
+        if not nro_guia:
+            log.error(f"Error: nro_guia no válido para la página {page_num + 1}. Se omitirá esta página.")
+            nro_guia = current_nro_guia
+        
+        # Validar CUIT: solo se hereda dentro de la misma guia. Una guia nueva
+        # sin CUIT queda sin CUIT (el writer rechaza el bloque y el archivo
+        # queda para reintentar) en lugar de tomar el del importador anterior
+        if not cuit_code:
+            if block_start is not None and nro_guia == current_nro_guia:
+                log.error(f"Error: CUIT no válido para la página {page_num + 1}. Se usa el CUIT del bloque actual.")
                 cuit_code = current_cuit_code
-            
-            if not nro_guia:
-                log_output.insert(tk.END, f"Error: nro_guia no válido para la página {page_num + 1}. Se omitirá esta página.\n")
-                nro_guia = current_nro_guia
-            
-            if pages_buffer and nro_guia != current_nro_guia:
-                log_output.insert(tk.END, f"Guardando bloque: CUIT={current_cuit_code}, nro_guia={nro_guia}\n")
-                pages_buffer[-1] = add_signature_to_page(pages_buffer[-1], image_path, img)
-                
-                # Carpeta de salida para este CUIT
-                p_directory = "\\\\10.55.55.9\\particulares"
-                current_output_folder = ensure_output_directory(p_directory, current_cuit_code, log_output)
-                
-                if current_output_folder:
-                    save_pdf_block(pages_buffer, current_output_folder, log_output, current_nro_guia)
-                    
-                pages_buffer = []
-            
-            current_cuit_code = cuit_code
-            current_nro_guia = nro_guia
-
-            pages_buffer.append(page)
-            log_output.insert(tk.END, f"Página {page_num + 1} agregada al bloque.\n")
-            log_output.see(tk.END)
-            
-        if pages_buffer:
-            log_output.insert(tk.END, f"Guardando el último bloque: CUIT={current_cuit_code}, nro_guia={current_nro_guia}\n")
-            pages_buffer[-1] = add_signature_to_page(pages_buffer[-1], image_path, img)
-
-            # Carpeta de salida para este CUIT
-            p_directory = "\\\\10.55.55.9\\particulares"
-            current_output_folder = ensure_output_directory(p_directory, current_cuit_code, log_output)
-            
-            if current_output_folder:
-                save_pdf_block(pages_buffer, current_output_folder, log_output, current_nro_guia)
+            else:
+                log.error(f"Error: CUIT no válido en la primera página de la guía {nro_guia} (página {page_num + 1}).")
         
-        log_output.insert(tk.END, f"Procesamiento finalizado\n")
-        log_output.see(tk.END)
-        mover_pdf_a_procesados(pdf_file_path, log_output)
+        if block_start is not None and nro_guia != current_nro_guia:
+            log.info(f"Guardando bloque: CUIT={current_cuit_code}, nro_guia={nro_guia}")
+            yield PageBlock(current_cuit_code, current_nro_guia, block_start, page_num)
+            block_start = None
+        
+        current_cuit_code = cuit_code
+        current_nro_guia = nro_guia
 
-    except Exception as e:
-        log_output.insert(tk.END, f"Error: No se pudo acceder al archivo {pdf_file_path} debido a permisos. {e}\n")
-        log_output.see(tk.END)
-        time.sleep(2)  # Espera antes de intentar de nuevo
+        if block_start is None:
+            block_start = page_num
+        log.info(f"Página {page_num + 1} agregada al bloque.")
         
-def save_pdf_block(pages_buffer, output_folder, log_output, nro_guia):    
+    if block_start is not None:
+        log.info(f"Guardando el último bloque: CUIT={current_cuit_code}, nro_guia={current_nro_guia}")
+        yield PageBlock(current_cuit_code, current_nro_guia, block_start, page_num + 1)
+
+def save_pdf_block(pages_buffer, image_path):
+    # Serializa el bloque en memoria; la escritura en el recurso compartido
+    # la hace el OutputWriter en segundo plano
     writer = PdfWriter()
-    for page in pages_buffer:
-        writer.add_page(page)
+    with metrics.stage("copiar"):
+        # En bloques largos las fuentes y XObjects que el original repite en
+        # cada pagina se copian una sola vez
+        if BLOCK_DEDUPE_MIN_PAGES and len(pages_buffer) >= BLOCK_DEDUPE_MIN_PAGES:
+            add_pages_deduped(writer, pages_buffer)
+        else:
+            for page in pages_buffer:
+                writer.add_page(page)
 
-    output_pdf_path = os.path.join(output_folder, f"{nro_guia}.pdf")
+    # La firma se agrega a la copia de la pagina en el writer, asi las paginas
+    # del reader no se modifican ni quedan retenidas en memoria
+    with metrics.stage("firma"):
+        add_signature_to_page(writer.pages[-1], image_path)
 
-    # Verificar que la ruta del archivo sea válida
-    if not os.path.isdir(output_folder):
-        log_output.insert(tk.END, f"Error: El directorio de salida no existe: {output_folder}\n")
-        log_output.see(tk.END)
-        return
+    output_pdf = io.BytesIO()
+    with metrics.stage("serializar"):
+        writer.write(output_pdf)
+    return output_pdf.getvalue()
+
+def build_block(reader, block, image_path, pages=None):
+    pages = reader.pages if pages is None else pages
+    pages_buffer = [pages[page_num] for page_num in range(block.start, block.end)]
+    return save_pdf_block(pages_buffer, image_path)
+
+def block_batches(blocks, workers):
+    # Agrupa bloques consecutivos en lotes de algunas decenas de paginas:
+    # cada lote abre el PDF una sola vez en el proceso del pool
+    total_pages = sum(block.end - block.start for block in blocks)
+    size = max(-(-total_pages // (workers * BLOCK_BATCHES_PER_WORKER)), BLOCK_BATCH_MIN_PAGES)
+    batch = []
+    pages = 0
+    for block in blocks:
+        batch.append(block)
+        pages += block.end - block.start
+        if pages >= size:
+            yield batch
+            batch = []
+            pages = 0
+    if batch:
+        yield batch
+
+def build_blocks_job(pdf_file_path, image_path, blocks, references):
+    # Como en la primera pasada, el proceso mapea el archivo en lugar de
+    # cargarlo entero en su memoria y lee solo las paginas del lote. El mapa
+    # se cierra con el lote: ningun proceso del pool retiene el archivo
+    # cuando hay que moverlo
+    results = []
+    with MappedFile(pdf_file_path) as mapped:
+        reader = PdfReader(mapped.buffer)
+        pages = ReferencedPages(reader, references, blocks[0].start)
+        for block in blocks:
+            # Los tiempos del bloque y de sus etapas (copiar, firma,
+            # serializar) vuelven con el resultado: las metricas viven en el
+            # proceso principal
+            start = time.perf_counter()
+            with metrics.collect() as stage_times:
+                data = build_block(reader, block, image_path, pages)
+            results.append((data, time.perf_counter() - start, stage_times))
+        del reader, pages
+    return results
+
+_process_pool = None
+_process_pool_lock = threading.Lock()
+
+def get_process_pool():
+    global _process_pool
+    with _process_pool_lock:
+        if _process_pool is None:
+            _process_pool = ProcessPoolExecutor(max_workers=PROCESS_WORKERS)
+        return _process_pool
 
+_output_writer = None
+_output_writer_lock = threading.Lock()
+
+def get_output_writer():
+    # Un unico writer para toda la aplicacion, asi la cache de carpetas de
+    # CUIT y el limite de bytes en vuelo son compartidos entre archivos
+    global _output_writer
+    with _output_writer_lock:
+        if _output_writer is None:
+            _output_writer = OutputWriter(
+                OUTPUT_DIRECTORY,
+                workers=OUTPUT_WRITERS,
+                max_inflight_bytes=OUTPUT_MAX_INFLIGHT_BYTES,
+                retries=OUTPUT_RETRIES,
+                manifest=OutputManifest(OUTPUT_MANIFEST_PATH),
+            )
+        return _output_writer
+
+_page_cache = None
+_page_cache_lock = threading.Lock()
+
+def get_page_cache():
+    global _page_cache
+    with _page_cache_lock:
+        if _page_cache is None:
+            _page_cache = PageCache(PAGE_CACHE_PATH, max_bytes=PAGE_CACHE_MAX_BYTES)
+        return _page_cache
+
+def submit_block(output_writer, journal, block, data):
+    # Entrega el bloque al writer y lo anota en el registro recien cuando
+    # quedo guardado en la carpeta de salida. El registro se escribe en la
+    # misma tarea del writer, asi al volver output_writer.wait() todos los
+    # bloques guardados ya estan anotados
+    digest = hashlib.sha256(data).hexdigest()
+    return output_writer.submit(block.cuit, block.nro_guia, data, digest,
+                                on_saved=lambda _: journal.record(block, digest))
+
+def log_skipped_block(block):
+    logger.info(f"Bloque ya guardado en un intento anterior, se omite: CUIT={block.cuit}, nro_guia={block.nro_guia}")
+
+def write_blocks_parallel(reader, pdf_file_path, image_path, records, output_writer, journal, writes,
+                          first_pass_log=None):
+    # Las escrituras se agregan a writes a medida que se envian, asi quien
+    # llama puede esperarlas aunque la funcion termine con una excepcion.
+    # Primera pasada: solo se buscan los limites de cada bloque. Los mensajes
+    # (los de iter_blocks y los de analyze_pages_parallel, que comparten
+    # first_pass_log) se guardan junto a la posicion de cada bloque para
+    # reproducir el mismo orden de log que el camino secuencial
+    first_pass_log = LogBuffer() if first_pass_log is None else first_pass_log
+    blocks = []
+    for block in iter_blocks(records, first_pass_log):
+        blocks.append((block, len(first_pass_log.records)))
+
+    # Cada bloque pendiente queda asociado al lote que lo construye y a su
+    # posicion dentro del resultado del lote. Solo hay unos pocos lotes en
+    # vuelo: el siguiente se envia cuando se consume el ultimo bloque de uno
+    pool = get_process_pool()
+    pending = [index for index, (block, _) in enumerate(blocks) if not journal.is_done(block)]
+    skipped = set(range(len(blocks))).difference(pending)
+    batches = block_batches([blocks[index][0] for index in pending], PROCESS_WORKERS)
+    remaining = iter(pending)
+    jobs = {}
+
+    def submit_batch():
+        batch = next(batches, None)
+        if batch is None:
+            return
+        future = pool.submit(build_blocks_job, pdf_file_path, image_path, batch,
+                             page_references(reader, batch[0].start, batch[-1].end))
+        for position in range(len(batch)):
+            jobs[next(remaining)] = (future, position, position == len(batch) - 1)
+
+    for _ in range(max(PROCESS_WORKERS * BLOCK_BATCHES_INFLIGHT_PER_WORKER, 1)):
+        submit_batch()
+
+    logged = 0
+    for index, (block, log_position) in enumerate(blocks):
+        first_pass_log.replay(logged, log_position)
+        logged = log_position
+        if index in skipped:
+            log_skipped_block(block)
+            continue
+        # Los lotes se envian en orden, asi el del bloque ya esta en vuelo. La
+        # entrada se descarta al consumirla para que el resultado del lote se
+        # libere con su ultimo bloque
+        future, position, last = jobs.pop(index)
+        data, seconds, stage_times = future.result()[position]
+        del future
+        if last:
+            submit_batch()
+        metrics.observe("bloque", seconds)
+        metrics.observe_collected(stage_times)
+        writes.append(submit_block(output_writer, journal, block, data))
+
+    first_pass_log.replay(logged)
+
+def split_pdf_add_img(pdf_file_path, image_path, workers=None):
+    journal = None
+    writes = []
+    stages = metrics.start_file()
     try:
-        with open(output_pdf_path, "wb") as output_pdf:
-            writer.write(output_pdf)
-            
-        log_output.insert(tk.END, f"Páginas procesada y guardadas en {output_pdf_path}\n")
+        # Esperar a que el archivo termine de copiarse antes de leerlo
+        with metrics.stage("espera"):
+            ready = wait_until_ready(pdf_file_path, timeout=READY_TIMEOUT)
+        if not ready:
+            logger.error(f"Error: El archivo {pdf_file_path} no terminó de copiarse o ya no existe.")
+            metrics.inc("dsi_files_total", result="error")
+            return False
 
-    except OSError as e:
-        log_output.insert(tk.END, f"Error al guardar el archivo {output_pdf_path}: {e}\n")    
+        # El archivo se abre y se mapea una sola vez: el hash y pypdf leen
+        # del mismo buffer. Se cierra antes de moverlo a PROCESADOS
+        with MappedFile(pdf_file_path) as mapped:
+            with metrics.stage("abrir"):
+                file_hash = file_content_hash(mapped.buffer)
+                cached_file = get_page_cache().open_file(file_hash) if PAGE_CACHE else None
+                journal = BlockJournal(os.path.join(JOURNAL_DIRECTORY, f"{file_hash}.jsonl"))
+
+                # En modo streaming pypdf lee del mapa a demanda en lugar de
+                # copiar el archivo entero a la memoria del proceso
+                reader = PdfReader(mapped.buffer if STREAMING else io.BytesIO(mapped.buffer[:]))
+            
+                # Ignorando la ultima hoja (resumen de DSI)
+                total_pages = len(reader.pages) - 1
+            metrics.inc("dsi_pages_total", total_pages)
+            timings = FieldTimings()
+            workers = PROCESS_WORKERS if workers is None else workers
+            parallel = workers > 1 and total_pages >= PARALLEL_MIN_PAGES
+            first_pass_log = LogBuffer()
+            if parallel and PARALLEL_ANALYSIS:
+                records = analyze_pages_parallel(reader, pdf_file_path, total_pages, timings, cached_file, workers,
+                                                 first_pass_log)
+            else:
+                records = analyze_pages(reader, total_pages, timings, cached_file)
+            
+            output_writer = get_output_writer()
+            try:
+                if parallel:
+                    write_blocks_parallel(reader, pdf_file_path, image_path, records, output_writer, journal, writes,
+                                          first_pass_log)
+                else:
+                    # Cada bloque se serializa y se entrega al writer apenas se
+                    # detecta el cambio de guia
+                    for block in iter_blocks(records):
+                        if journal.is_done(block):
+                            log_skipped_block(block)
+                            continue
+                        with metrics.stage("bloque"):
+                            data = build_block(reader, block, image_path)
+                        writes.append(submit_block(output_writer, journal, block, data))
+            finally:
+                # Lo ya analizado queda en la cache aunque el archivo falle
+                if cached_file:
+                    cached_file.flush()
+            del reader
+        
+        # Las escrituras terminan en segundo plano; el original solo se mueve
+        # cuando todos los bloques de este archivo ya se intentaron guardar
+        with metrics.stage("esperar_escrituras"):
+            failed = output_writer.wait(writes)
         
-    log_output.see(tk.END)
+        logger.info(f"Tiempos de extracción: {timings.summary()}")
+        if cached_file:
+            logger.info(f"Caché de páginas: {cached_file.summary()}")
+        if failed:
+            # El original queda en input_pdf y el registro en disco: al
+            # reintentar (o reiniciar) solo se escriben los bloques faltantes
+            logger.error(
+                f"Error: {failed} bloque(s) de {pdf_file_path} no se pudieron guardar. "
+                f"El archivo queda en input_pdf para reintentar.")
+            journal.close()
+            metrics.inc("dsi_files_total", result="error")
+            return False
+        logger.info(f"Procesamiento finalizado")
+        mover_pdf_a_procesados(pdf_file_path)
+        journal.discard()
+        metrics.inc("dsi_files_total", result="ok")
+        if stages:
+            logger.info(f"Etapas de {os.path.basename(pdf_file_path)}: {stages.summary()}")
+        return True
 
+    except Exception as e:
+        logger.error(f"Error: No se pudo acceder al archivo {pdf_file_path} debido a permisos. {e}")
+        if journal:
+            # Los bloques ya enviados terminan de guardarse y quedan anotados
+            # antes de cerrar; el registro queda en disco para retomar el archivo
+            if writes:
+                get_output_writer().wait(writes)
+            journal.close()
+        metrics.inc("dsi_files_total", result="error")
+        time.sleep(2)  # Espera antes de intentar de nuevo
+        return False
 
-def mover_pdf_a_procesados(pdf_file_path, log_output):
+    finally:
+        metrics.finish_file(stages)
+        
+def process_pdf(pdf_file_path):
+    # Procesa un archivo; si se pidio un perfil (--profile o el archivo de
+    # control en input_pdf) corre bajo cProfile y tracemalloc, en un solo
+    # proceso para que pypdf y reportlab aparezcan en el perfil, y el
+    # resultado queda en PROCESADOS junto al archivo
+    if take_profile_request(WATCH_DIRECTORY):
+        logger.info(f"Perfilando el procesamiento de {pdf_file_path}")
+        return run_profiled(
+            os.path.join(base_directory, "PROCESADOS"), os.path.basename(pdf_file_path),
+            split_pdf_add_img, pdf_file_path, SIGNATURE_IMAGE, workers=1)
+    return split_pdf_add_img(pdf_file_path, SIGNATURE_IMAGE)
+
+def mover_pdf_a_procesados(pdf_file_path):
     processed_folder = os.path.join(base_directory, "PROCESADOS")
 
     if not os.path.exists(processed_folder):
-        os.makedirs(processed_folder)
-        log_output.insert(tk.END, f"Creando carpeta de procesados: {processed_folder}\n")
-        log_output.insert(tk.END, f"Carpeta creada con suceso!\n")
+        # exist_ok: otro trabajo en paralelo puede haberla creado recien
+        os.makedirs(processed_folder, exist_ok=True)
+        logger.info(f"Creando carpeta de procesados: {processed_folder}")
+        logger.info(f"Carpeta creada con suceso!")
 
     destino_pdf = os.path.join(
         processed_folder, os.path.basename(pdf_file_path))
-    shutil.move(pdf_file_path, destino_pdf)
-    log_output.insert(tk.END, f"Archivo original movido desde carpeta input_pdf a carpeta PROCESADOS\n")
-    log_output.insert(tk.END, f"Rutina de procesamiento finalizada!\n")
+    with metrics.stage("mover"):
+        shutil.move(pdf_file_path, destino_pdf)
+    logger.info(f"Archivo original movido desde carpeta input_pdf a carpeta PROCESADOS")
+    logger.info(f"Rutina de procesamiento finalizada!")
 
 
-def start_observer(log_output):
+def start_observer():
     if not os.path.exists(WATCH_DIRECTORY):
-        log_output.insert(tk.END, f"Error: El directorio {WATCH_DIRECTORY} no existe o no es accesible.\n")
-        log_output.see(tk.END)
+        logger.error(f"Error: El directorio {WATCH_DIRECTORY} no existe o no es accesible.")
         return
 
-    event_handler = PDFHandler(log_output)
+    def log_job_status(path, status):
+        logger.info(f"Estado de {os.path.basename(path)}: {status}")
+
+    # Los archivos se procesan en hilos propios para no bloquear al observador
+    job_queue = JobQueue(
+        process_pdf,
+        workers=JOB_WORKERS,
+        maxsize=JOB_QUEUE_SIZE,
+        on_status=log_job_status,
+    )
+
+    event_handler = PDFHandler(job_queue)
     observer = Observer()
     observer.schedule(event_handler, WATCH_DIRECTORY, recursive=False)
 
-    log_output.insert(
-        tk.END, f"Bienvenido al procesador de DSI. Agregar archivo PDF a la carpeta input_pdf\n")
-    log_output.see(tk.END)
+    logger.info(f"Bienvenido al procesador de DSI. Agregar archivo PDF a la carpeta input_pdf")
 
     try:
         observer.start()
     except Exception as e:
-        log_output.insert(tk.END, f"Error al iniciar el observador: {e}\n")
-        log_output.see(tk.END)
+        logger.error(f"Error al iniciar el observador: {e}")
         return
 
+    # El observador ya esta activo: los archivos que lleguen desde ahora
+    # generan eventos y los que ya estaban se encolan aca, por antiguedad.
+    # Un archivo que aparezca por las dos vias se encola una sola vez
+    backlog = list_pdfs(WATCH_DIRECTORY)
+    if backlog:
+        logger.info(f"Archivos PDF pendientes en input_pdf al iniciar: {len(backlog)}")
+    for path in backlog:
+        event_handler.queue_pdf(path)
+
     try:
+        next_sweep = time.monotonic() + RECONCILE_INTERVAL
         while True:
             time.sleep(0.5)
+            if time.monotonic() >= next_sweep:
+                # Barrido de conciliacion por si watchdog perdio eventos
+                event_handler.reconcile()
+                next_sweep = time.monotonic() + RECONCILE_INTERVAL
     except KeyboardInterrupt:
         observer.stop()
 
     observer.join()
+    job_queue.stop()
+
+def start_gui(metrics_port=0):
+    # Tk se importa solo en modo grafico; el modo --headless no lo necesita
+    import tkinter as tk
+    from tkinter.scrolledtext import ScrolledText
 
-def start_gui():
     root = tk.Tk()
     root.title("Monitor de PDFs")
 
@@ -255,28 +960,163 @@ def start_gui():
     log_output = ScrolledText(root, wrap=tk.WORD, width=100, height=30)
     log_output.pack(padx=10, pady=10, fill=tk.BOTH, expand=True)
 
+    # Los mensajes de los hilos de trabajo llegan al widget por una cola que
+    # se vacia desde el mainloop; ademas quedan en un archivo rotativo
+    setup_logging(LOG_DIRECTORY)
+    logger.addHandler(TkLogSink(log_output, max_lines=LOG_MAX_LINES))
+    enable_metrics(metrics_port)
+
     # Iniciar el observador en un hilo separado
-    observer_thread = threading.Thread(
-        target=start_observer, args=(log_output,))
+    observer_thread = threading.Thread(target=start_observer)
     observer_thread.daemon = True
     observer_thread.start()
 
     root.mainloop()
 
 class PDFHandler(FileSystemEventHandler):
-    def __init__(self, log_output):
-        self.log_output = log_output
+    def __init__(self, job_queue):
+        self.job_queue = job_queue
+        # Tamano y mtime de cada archivo al encolarlo
+        self._queued_stats = {}
 
     def on_created(self, event):
         if event.is_directory:
             return
 
-        if event.src_path.endswith(".pdf"):
-            self.log_output.insert(
-                tk.END, f"Nuevo archivo PDF detectado: {event.src_path}\n")
-            self.log_output.see(tk.END)
-            split_pdf_add_img(event.src_path, SIGNATURE_IMAGE, self.log_output)
+        self.queue_pdf(event.src_path)
+
+    def on_modified(self, event):
+        # Las copias largas generan varios eventos de modificacion; solo se
+        # encola si el archivo no esta ya en la cola
+        if event.is_directory:
+            return
+
+        self.queue_pdf(event.src_path)
+
+    def on_moved(self, event):
+        # Programas que copian a un temporal y luego renombran a .pdf
+        if event.is_directory:
+            return
+
+        self.queue_pdf(event.dest_path)
+
+    def queue_pdf(self, path):
+        if not path.endswith(".pdf"):
+            return
+
+        # Ignorar archivos que ya se movieron o que no estan en input_pdf
+        if os.path.dirname(os.path.abspath(path)) != os.path.abspath(WATCH_DIRECTORY):
+            return
+        try:
+            stat = os.stat(path)
+        except OSError:
+            return
+        if self.job_queue.status(path) in (PENDING, RUNNING):
+            return
+        self._queued_stats[path] = (stat.st_size, stat.st_mtime_ns)
+
+        logger.info(f"Nuevo archivo PDF detectado: {path}")
+
+        if self.job_queue.is_full():
+            logger.warning(f"Cola de procesamiento llena, esperando lugar para {path}")
+        if not self.job_queue.submit(path):
+            logger.info(f"El archivo {path} ya está en proceso, se ignora el evento.")
+
+    def reconcile(self):
+        # Encola lo que siga en input_pdf sin estar en la cola. Un archivo que
+        # fallo solo se reintenta si cambio desde que se encolo (o al reiniciar)
+        pdf_files = list_pdfs(WATCH_DIRECTORY)
+        # Lo que ya salio de input_pdf (procesado o quitado a mano) se olvida
+        present = {os.path.normcase(os.path.abspath(path)) for path in pdf_files}
+        for path in list(self._queued_stats):
+            if os.path.normcase(os.path.abspath(path)) not in present and self.job_queue.status(path) not in (PENDING, RUNNING):
+                self._queued_stats.pop(path, None)
+                self.job_queue.forget(path)
+        for path in pdf_files:
+            if self.job_queue.status(path) == FAILED:
+                try:
+                    stat = os.stat(path)
+                except OSError:
+                    continue
+                if self._queued_stats.get(path) == (stat.st_size, stat.st_mtime_ns):
+                    continue
+            self.queue_pdf(path)
+
+def list_pdfs(directory):
+    # PDFs de la carpeta del mas antiguo al mas nuevo; los que desaparecen
+    # mientras se listan se descartan
+    pdf_files = []
+    for name in os.listdir(directory):
+        if not name.endswith(".pdf"):
+            continue
+        path = os.path.join(directory, name)
+        try:
+            pdf_files.append((os.path.getmtime(path), path))
+        except OSError:
+            continue
+    return [path for _, path in sorted(pdf_files)]
+
+def process_path(path):
+    # Procesa una vez un archivo o todos los PDF de una carpeta (por
+    # antiguedad), sin observador; pensado para reprocesos por lote
+    if os.path.isdir(path):
+        pdf_files = list_pdfs(path)
+    elif os.path.isfile(path):
+        pdf_files = [path]
+    else:
+        logger.error(f"Error: {path} no existe o no es accesible.")
+        return False
+
+    if not pdf_files:
+        logger.warning(f"Advertencia: No hay archivos PDF en {path}")
+
+    ok = True
+    for pdf_file_path in pdf_files:
+        logger.info(f"Procesando {pdf_file_path}")
+        ok = process_pdf(pdf_file_path) and ok
+    return ok
+
+def parse_args(argv=None):
+    parser = argparse.ArgumentParser(description="Procesador de DSI: separa por guía y firma los PDF.")
+    parser.add_argument(
+        "--headless", action="store_true",
+        help="observar input_pdf sin interfaz gráfica, con log en consola y archivo")
+    subparsers = parser.add_subparsers(dest="command")
+    process_parser = subparsers.add_parser(
+        "process", help="procesar una vez un PDF o una carpeta de PDFs y salir")
+    process_parser.add_argument("path", help="archivo PDF o carpeta")
+    parser.add_argument(
+        "--profile", action="store_true",
+        help="procesar el próximo archivo con cProfile y tracemalloc; el perfil queda en PROCESADOS")
+    parser.add_argument(
+        "--metrics-port", type=int, default=METRICS_PORT,
+        help="publicar métricas en formato Prometheus en este puerto local (0 las desactiva)")
+    return parser.parse_args(argv)
+
+def enable_metrics(port):
+    if port:
+        metrics.enable(port)
+
+def main(argv=None):
+    args = parse_args(argv)
+    if args.profile:
+        request_profile()
+
+    if args.command == "process":
+        setup_logging(LOG_DIRECTORY, console=True)
+        enable_metrics(args.metrics_port)
+        return 0 if process_path(args.path) else 1
+
+    if args.headless:
+        setup_logging(LOG_DIRECTORY, console=True)
+        enable_metrics(args.metrics_port)
+        start_observer()
+        return 0
+
+    start_gui(args.metrics_port)
+    return 0
 
-# Iniciar la interfaz gráfica
 if __name__ == "__main__":
-    start_gui()
+    # Necesario para el pool de procesos en el ejecutable de PyInstaller
+    multiprocessing.freeze_support()
+    sys.exit(main())
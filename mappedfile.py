@@ -0,0 +1,35 @@
+import mmap
+
+
+class MappedFile:
+    # Archivo de entrada abierto una sola vez y mapeado en memoria de solo
+    # lectura. Todos los que lo leen (hash, pypdf, estampado de bloques)
+    # usan las mismas paginas del cache del sistema operativo: no hay
+    # lecturas repetidas ni copias del archivo en la memoria del proceso.
+    # Hay que cerrarlo antes de mover el archivo: en Windows un archivo
+    # abierto o mapeado no se puede renombrar.
+
+    def __init__(self, path):
+        self.path = path
+        self._file = open(path, "rb")
+        try:
+            # buffer sirve como bytes (hashlib, slices) y como archivo (pypdf)
+            self.buffer = mmap.mmap(self._file.fileno(), 0, access=mmap.ACCESS_READ)
+        except Exception:
+            self._file.close()
+            raise
+
+    @property
+    def size(self):
+        return len(self.buffer)
+
+    def close(self):
+        self.buffer.close()
+        self._file.close()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc_info):
+        self.close()
+        return False
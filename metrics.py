@@ -0,0 +1,210 @@
+import bisect
+import contextvars
+import logging
+import threading
+import time
+from contextlib import contextmanager, nullcontext
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+logger = logging.getLogger("dsi.metrics")
+
+# Limites (segundos) de los buckets del histograma de cada etapa
+STAGE_BUCKETS = (0.001, 0.005, 0.01, 0.05, 0.1, 0.5, 1.0, 5.0, 10.0, 30.0, 60.0, 300.0)
+
+# Desactivado, stage() devuelve siempre el mismo contexto vacio y inc() /
+# observe() vuelven enseguida: el costo es una llamada por etapa
+_enabled = False
+_noop = nullcontext()
+# Tiempos por etapa del archivo en curso en este hilo (ver start_file)
+_current_file = contextvars.ContextVar("dsi_file_stages", default=None)
+# Etapas medidas en un proceso del pool para devolverlas con el resultado (ver collect)
+_collected = contextvars.ContextVar("dsi_collected_stages", default=None)
+
+
+class Registry:
+    # Contadores e histogramas del proceso, en formato de texto de Prometheus
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._counters = {}
+        self._histograms = {}
+
+    def inc(self, name, value=1, **labels):
+        key = (name, tuple(sorted(labels.items())))
+        with self._lock:
+            self._counters[key] = self._counters.get(key, 0) + value
+
+    def observe(self, stage, seconds):
+        with self._lock:
+            histogram = self._histograms.get(stage)
+            if histogram is None:
+                histogram = self._histograms[stage] = [[0] * len(STAGE_BUCKETS), 0, 0.0]
+            buckets, _, _ = histogram
+            position = bisect.bisect_left(STAGE_BUCKETS, seconds)
+            if position < len(buckets):
+                buckets[position] += 1
+            histogram[1] += 1
+            histogram[2] += seconds
+
+    def render(self):
+        lines = []
+        with self._lock:
+            for name in sorted({name for name, _ in self._counters}):
+                lines.append(f"# TYPE {name} counter")
+                for (counter, labels), value in sorted(self._counters.items()):
+                    if counter == name:
+                        lines.append(f"{name}{_format_labels(labels)} {value}")
+
+            if self._histograms:
+                lines.append("# TYPE dsi_stage_seconds histogram")
+            for stage, (buckets, count, total) in sorted(self._histograms.items()):
+                cumulative = 0
+                for limit, bucket_count in zip(STAGE_BUCKETS, buckets):
+                    cumulative += bucket_count
+                    lines.append(f'dsi_stage_seconds_bucket{{stage="{stage}",le="{limit}"}} {cumulative}')
+                lines.append(f'dsi_stage_seconds_bucket{{stage="{stage}",le="+Inf"}} {count}')
+                lines.append(f'dsi_stage_seconds_sum{{stage="{stage}"}} {total}')
+                lines.append(f'dsi_stage_seconds_count{{stage="{stage}"}} {count}')
+        return "\n".join(lines) + "\n"
+
+
+def _format_labels(labels):
+    if not labels:
+        return ""
+    return "{" + ",".join(f'{key}="{value}"' for key, value in labels) + "}"
+
+
+REGISTRY = Registry()
+
+
+class FileStages:
+    # Tiempo acumulado por etapa de un archivo, para la linea de resumen
+
+    def __init__(self):
+        self.seconds = {}
+        self.token = None
+        self._lock = threading.Lock()
+
+    def add(self, stage, seconds):
+        with self._lock:
+            self.seconds[stage] = self.seconds.get(stage, 0.0) + seconds
+
+    def summary(self):
+        with self._lock:
+            return ", ".join(f"{stage}={seconds * 1000:.1f} ms" for stage, seconds in self.seconds.items())
+
+
+class _StageTimer:
+    __slots__ = ("stage", "start", "into")
+
+    def __init__(self, stage, into=None):
+        self.stage = stage
+        self.into = into
+
+    def __enter__(self):
+        self.start = time.perf_counter()
+        return self
+
+    def __exit__(self, *exc_info):
+        seconds = time.perf_counter() - self.start
+        if self.into is None:
+            observe(self.stage, seconds)
+        else:
+            self.into[self.stage] = self.into.get(self.stage, 0.0) + seconds
+        return False
+
+
+def enabled():
+    return _enabled
+
+
+def stage(name):
+    # with metrics.stage("extraer"): ...
+    collected = _collected.get()
+    if collected is not None:
+        return _StageTimer(name, collected)
+    if not _enabled:
+        return _noop
+    return _StageTimer(name)
+
+
+@contextmanager
+def collect():
+    # En un proceso del pool las metricas no llegan al proceso principal: las
+    # etapas medidas dentro del with se acumulan en el dict devuelto, que
+    # viaja con el resultado y se registra con observe_collected
+    collected = {}
+    token = _collected.set(collected)
+    try:
+        yield collected
+    finally:
+        _collected.reset(token)
+
+
+def observe_collected(collected):
+    for stage_name, seconds in collected.items():
+        observe(stage_name, seconds)
+
+
+def observe(stage_name, seconds):
+    # Para tiempos medidos en otro proceso (pool de firma)
+    if not _enabled:
+        return
+    REGISTRY.observe(stage_name, seconds)
+    file_stages = _current_file.get()
+    if file_stages is not None:
+        file_stages.add(stage_name, seconds)
+
+
+def inc(name, value=1, **labels):
+    if _enabled:
+        REGISTRY.inc(name, value, **labels)
+
+
+def start_file():
+    # Asocia al hilo actual (y a las tareas lanzadas con su contexto) un
+    # acumulador de etapas para el archivo; None si las metricas estan apagadas
+    if not _enabled:
+        return None
+    current = FileStages()
+    current.token = _current_file.set(current)
+    return current
+
+
+def finish_file(file_stages):
+    if file_stages is not None:
+        _current_file.reset(file_stages.token)
+
+
+class _MetricsHandler(BaseHTTPRequestHandler):
+    def do_GET(self):
+        if self.path.rstrip("/") not in ("", "/metrics"):
+            self.send_error(404)
+            return
+        body = REGISTRY.render().encode("utf-8")
+        self.send_response(200)
+        self.send_header("Content-Type", "text/plain; version=0.0.4; charset=utf-8")
+        self.send_header("Content-Length", str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+    def log_message(self, format, *args):
+        # Las consultas de Prometheus no van al log de la aplicacion
+        pass
+
+
+def enable(port=None, host="127.0.0.1"):
+    # Activa las metricas y, con port, las publica en http://host:port/metrics
+    global _enabled
+    _enabled = True
+    if not port:
+        return None
+    try:
+        server = ThreadingHTTPServer((host, port), _MetricsHandler)
+    except OSError as e:
+        logger.error(f"Error: No se pudo abrir el puerto de métricas {port}. {e}")
+        return None
+    thread = threading.Thread(target=server.serve_forever, name="dsi-metrics", daemon=True)
+    thread.start()
+    logger.info(f"Métricas disponibles en http://{host}:{port}/metrics")
+    return server
@@ -0,0 +1,195 @@
+import contextvars
+import hashlib
+import logging
+import os
+import sqlite3
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor, wait
+
+import metrics
+
+logger = logging.getLogger("dsi.writer")
+
+
+def valid_path_part(value):
+    # CUIT y nro_guia se usan como nombre de carpeta y de archivo
+    return (isinstance(value, str) and value.strip() != "" and value not in (".", "..")
+            and not any(separator in value for separator in ("/", "\\")))
+
+
+class OutputManifest:
+    # Registro local (SQLite) del tamano y hash de cada archivo guardado en la
+    # carpeta de salida, para no reescribir los que no cambiaron
+
+    def __init__(self, path):
+        self._lock = threading.Lock()
+        os.makedirs(os.path.dirname(path) or ".", exist_ok=True)
+        self._connection = sqlite3.connect(path, check_same_thread=False)
+        self._connection.execute(
+            "CREATE TABLE IF NOT EXISTS outputs ("
+            " path TEXT PRIMARY KEY,"
+            " size INTEGER NOT NULL,"
+            " sha256 TEXT NOT NULL)")
+        self._connection.commit()
+
+    def get(self, path):
+        with self._lock:
+            return self._connection.execute(
+                "SELECT size, sha256 FROM outputs WHERE path = ?", (path,)).fetchone()
+
+    def put(self, path, size, digest):
+        with self._lock:
+            self._connection.execute(
+                "INSERT OR REPLACE INTO outputs VALUES (?, ?, ?)", (path, size, digest))
+            self._connection.commit()
+
+    def close(self):
+        with self._lock:
+            self._connection.close()
+
+
+class OutputWriter:
+    # Escribe los bloques ya serializados en la carpeta de salida (el recurso
+    # compartido de red) desde un pool de hilos propio, para que la latencia
+    # del recurso no frene el recorrido de las paginas.
+    # - max_inflight_bytes acota la memoria de los bloques pendientes: submit()
+    #   espera si se supera (un bloque mas grande que el limite pasa solo).
+    # - Cada escritura se reintenta `retries` veces ante errores de E/S.
+    # - Las carpetas de CUIT ya creadas se recuerdan para no volver a
+    #   consultarlas en el recurso compartido.
+    # - Con un manifest, un archivo igual (tamano y hash) al ya guardado no
+    #   se reescribe; solo se verifica su tamano en el recurso compartido.
+    # - Se escribe en un temporal y se renombra, asi quien lee la carpeta
+    #   nunca ve un PDF a medio escribir.
+    # base_path puede ser una carpeta local para pruebas.
+
+    def __init__(self, base_path, workers=4, max_inflight_bytes=64 * 1024 * 1024,
+                 retries=3, retry_delay=1.0, manifest=None):
+        self.base_path = base_path
+        self.manifest = manifest
+        self.max_inflight_bytes = max_inflight_bytes
+        self.retries = retries
+        self.retry_delay = retry_delay
+        self._pool = ThreadPoolExecutor(max_workers=workers, thread_name_prefix="dsi-writer")
+        self._inflight_bytes = 0
+        self._inflight_cond = threading.Condition()
+        self._known_directories = set()
+        self._directories_lock = threading.Lock()
+
+    def ensure_directory(self, directory):
+        with self._directories_lock:
+            if directory in self._known_directories:
+                return
+        os.makedirs(directory, exist_ok=True)
+        with self._directories_lock:
+            self._known_directories.add(directory)
+
+    def forget_directory(self, directory):
+        with self._directories_lock:
+            self._known_directories.discard(directory)
+
+    def submit(self, cuit_code, nro_guia, data, digest=None, on_saved=None):
+        # on_saved(ruta) corre en la tarea del writer, antes de que el future
+        # termine: quien espera con wait() ya lo ve ejecutado
+        size = len(data)
+        with self._inflight_cond:
+            while self._inflight_bytes and self._inflight_bytes + size > self.max_inflight_bytes:
+                self._inflight_cond.wait()
+            self._inflight_bytes += size
+
+        # Con el contexto de quien envia, el tiempo de escritura se suma a las
+        # etapas de ese archivo
+        context = contextvars.copy_context()
+        future = self._pool.submit(context.run, self._write_block, cuit_code, nro_guia, data, digest, on_saved)
+        future.add_done_callback(lambda _: self._release(size))
+        return future
+
+    def wait(self, futures):
+        # Espera las escrituras de un archivo; devuelve cuantas fallaron
+        done, _ = wait(futures)
+        failed = 0
+        for future in done:
+            error = future.exception()
+            if error is not None:
+                logger.error(f"Error inesperado al guardar un bloque: {error!r}")
+            if error is not None or not future.result():
+                failed += 1
+        return failed
+
+    def shutdown(self):
+        self._pool.shutdown(wait=True)
+
+    def _release(self, size):
+        with self._inflight_cond:
+            self._inflight_bytes -= size
+            self._inflight_cond.notify_all()
+
+    def _unchanged(self, output_pdf_path, size, digest):
+        if self.manifest is None or self.manifest.get(output_pdf_path) != (size, digest):
+            return False
+        try:
+            # El archivo pudo haberse borrado o reemplazado en el recurso compartido
+            return os.stat(output_pdf_path).st_size == size
+        except OSError:
+            return False
+
+    def _write_block(self, cuit_code, nro_guia, data, digest, on_saved):
+        output_pdf_path = self._write(cuit_code, nro_guia, data, digest)
+        if output_pdf_path and on_saved:
+            on_saved(output_pdf_path)
+        return output_pdf_path
+
+    def _write(self, cuit_code, nro_guia, data, digest=None):
+        # Un bloque sin CUIT o nro_guia (o con un separador de carpeta) no
+        # tiene destino: se informa y cuenta como fallido
+        if not valid_path_part(cuit_code) or not valid_path_part(nro_guia):
+            logger.error(f"Error: No se puede guardar el bloque CUIT={cuit_code}, nro_guia={nro_guia}: "
+                         f"CUIT o nro_guia no válido.")
+            metrics.inc("dsi_write_errors_total")
+            return None
+
+        # Carpeta de salida para este CUIT
+        output_folder = os.path.join(self.base_path, cuit_code)
+        output_pdf_path = os.path.join(output_folder, f"{nro_guia}.pdf")
+        temp_pdf_path = f"{output_pdf_path}.{os.getpid()}.{threading.get_ident()}.tmp"
+
+        if self.manifest is not None:
+            digest = digest or hashlib.sha256(data).hexdigest()
+            if self._unchanged(output_pdf_path, len(data), digest):
+                logger.info(f"Sin cambios, no se reescribe {output_pdf_path}")
+                metrics.inc("dsi_blocks_unchanged_total")
+                return output_pdf_path
+
+        for attempt in range(self.retries + 1):
+            if attempt:
+                time.sleep(self.retry_delay * attempt)
+            try:
+                with metrics.stage("escribir"):
+                    self.ensure_directory(output_folder)
+                    with open(temp_pdf_path, "wb") as output_pdf:
+                        output_pdf.write(data)
+                    os.replace(temp_pdf_path, output_pdf_path)
+            except OSError as e:
+                # La carpeta pudo haberse borrado en el recurso compartido
+                self.forget_directory(output_folder)
+                self._remove_temp(temp_pdf_path)
+                metrics.inc("dsi_write_errors_total")
+                error = e
+                continue
+
+            if self.manifest is not None:
+                self.manifest.put(output_pdf_path, len(data), digest)
+            metrics.inc("dsi_blocks_written_total")
+            metrics.inc("dsi_bytes_written_total", len(data))
+            logger.info(f"Páginas procesada y guardadas en {output_pdf_path}")
+            return output_pdf_path
+
+        logger.error(f"Error al guardar el archivo {output_pdf_path}: {error}")
+        return None
+
+    def _remove_temp(self, temp_pdf_path):
+        try:
+            os.remove(temp_pdf_path)
+        except OSError:
+            pass
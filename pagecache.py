@@ -0,0 +1,161 @@
+import hashlib
+import logging
+import os
+import sqlite3
+import threading
+import time
+
+logger = logging.getLogger("dsi.cache")
+
+# Version del contenido guardado; si cambia la extraccion de campos se sube
+# y la cache anterior se descarta al abrirla
+CACHE_VERSION = 3
+# Bytes estimados por fila ademas del texto de sus columnas
+ROW_OVERHEAD_BYTES = 64
+
+
+def file_content_hash(buffer):
+    # SHA-256 del contenido del archivo, directo sobre el buffer mapeado en
+    # memoria (ver MappedFile), sin leerlo por partes
+    return hashlib.sha256(buffer).hexdigest()
+
+
+class PageCache:
+    # Cache en disco (SQLite) de los campos ya extraidos de cada pagina,
+    # por hash del contenido del archivo e indice de pagina. Si un archivo
+    # falla a mitad de camino y se vuelve a dejar, las paginas ya analizadas
+    # no se extraen de nuevo.
+    # - Las filas se graban de a batch_size, asi un corte no pierde todo.
+    # - Al superar max_bytes se descartan los archivos usados hace mas tiempo.
+
+    def __init__(self, path, max_bytes=32 * 1024 * 1024, batch_size=200):
+        self.path = path
+        self.max_bytes = max_bytes
+        self.batch_size = batch_size
+        self._lock = threading.Lock()
+        os.makedirs(os.path.dirname(path) or ".", exist_ok=True)
+        self._connection = sqlite3.connect(path, check_same_thread=False)
+        self._create_schema()
+        self._total_bytes = self._connection.execute(
+            "SELECT COALESCE(SUM(size), 0) FROM pages").fetchone()[0]
+
+    def _create_schema(self):
+        version = self._connection.execute("PRAGMA user_version").fetchone()[0]
+        if version != CACHE_VERSION:
+            self._connection.execute("DROP TABLE IF EXISTS pages")
+            self._connection.execute(f"PRAGMA user_version = {CACHE_VERSION}")
+        self._connection.execute(
+            "CREATE TABLE IF NOT EXISTS pages ("
+            " file_hash TEXT NOT NULL,"
+            " page INTEGER NOT NULL,"
+            " cuit TEXT,"
+            " nro_guia TEXT,"
+            " size INTEGER NOT NULL,"
+            " last_used REAL NOT NULL,"
+            " PRIMARY KEY (file_hash, page))")
+        self._connection.commit()
+
+    def open_file(self, file_hash):
+        # Carga las paginas guardadas del archivo y lo marca como recien usado
+        with self._lock:
+            rows = self._connection.execute(
+                "SELECT page, cuit, nro_guia FROM pages WHERE file_hash = ?", (file_hash,)).fetchall()
+            if rows:
+                self._connection.execute(
+                    "UPDATE pages SET last_used = ? WHERE file_hash = ?", (time.time(), file_hash))
+                self._connection.commit()
+        return CachedFile(self, file_hash, {page: (cuit, nro_guia) for page, cuit, nro_guia in rows})
+
+    def store(self, rows):
+        # rows: (file_hash, page, cuit, nro_guia)
+        now = time.time()
+        entries = [
+            (file_hash, page, cuit, nro_guia,
+             len(file_hash) + len(cuit or "") + len(nro_guia or "") + ROW_OVERHEAD_BYTES, now)
+            for file_hash, page, cuit, nro_guia in rows
+        ]
+        with self._lock:
+            try:
+                # Una fila que ya estaba (el mismo archivo en dos trabajos, o un
+                # reintento) se reemplaza: solo cuenta la diferencia de tamano
+                replaced = sum(
+                    row[0] for file_hash, page, *_ in entries
+                    for row in self._connection.execute(
+                        "SELECT size FROM pages WHERE file_hash = ? AND page = ?", (file_hash, page)))
+                self._connection.executemany(
+                    "INSERT OR REPLACE INTO pages VALUES (?, ?, ?, ?, ?, ?)", entries)
+                self._connection.commit()
+            except sqlite3.Error as e:
+                logger.warning(f"Advertencia: No se pudo guardar la caché de páginas. {e}")
+                return
+            self._total_bytes += sum(entry[4] for entry in entries) - replaced
+            if self._total_bytes > self.max_bytes:
+                self._evict()
+
+    def _evict(self):
+        # Descartar archivos completos, del usado hace mas tiempo al mas reciente
+        files = self._connection.execute(
+            "SELECT file_hash, SUM(size) FROM pages"
+            " GROUP BY file_hash ORDER BY MAX(last_used)").fetchall()
+        for file_hash, size in files:
+            if self._total_bytes <= self.max_bytes:
+                break
+            self._connection.execute("DELETE FROM pages WHERE file_hash = ?", (file_hash,))
+            self._total_bytes -= size
+        self._connection.commit()
+        # Se vuelve a sumar desde la tabla, por si otra instancia la modifico
+        self._total_bytes = self._connection.execute(
+            "SELECT COALESCE(SUM(size), 0) FROM pages").fetchone()[0]
+
+    def close(self):
+        with self._lock:
+            self._connection.close()
+
+
+class CachedFile:
+    # Vista de la cache para un archivo: consulta por pagina, acumula las
+    # paginas nuevas y cuenta aciertos y fallos
+
+    def __init__(self, cache, file_hash, entries):
+        self.cache = cache
+        self.file_hash = file_hash
+        self.entries = entries
+        self.hits = 0
+        self.misses = 0
+        self._pending = []
+
+    def get(self, page):
+        entry = self.entries.get(page)
+        if entry is None:
+            self.misses += 1
+        else:
+            self.hits += 1
+        return entry
+
+    def put(self, page, cuit, nro_guia):
+        self._pending.append((self.file_hash, page, cuit, nro_guia))
+        if self.cache is not None and len(self._pending) >= self.cache.batch_size:
+            self.flush()
+
+    def flush(self):
+        if self._pending and self.cache is not None:
+            self.cache.store(self._pending)
+            self._pending = []
+
+    def detached(self, start, end):
+        # Copia sin conexion de las paginas [start, end), para analizarlas en
+        # otro proceso; las paginas nuevas y los contadores vuelven con merge
+        entries = {page: entry for page, entry in self.entries.items() if start <= page < end}
+        return CachedFile(None, self.file_hash, entries)
+
+    def merge(self, detached):
+        self.hits += detached.hits
+        self.misses += detached.misses
+        self._pending.extend(detached._pending)
+        if len(self._pending) >= self.cache.batch_size:
+            self.flush()
+
+    def summary(self):
+        total = self.hits + self.misses
+        rate = self.hits * 100 / total if total else 0
+        return f"{self.hits} aciertos, {self.misses} fallos ({rate:.0f}%)"
@@ -0,0 +1,110 @@
+import hashlib
+import logging
+
+import pypdf
+from pypdf.generic import DictionaryObject, IndirectObject, StreamObject
+
+logger = logging.getLogger("dsi.pdfdedupe")
+
+# Categorias de /Resources que se unifican entre las paginas de un bloque
+DEDUPE_RESOURCE_CATEGORIES = ("/Font", "/XObject")
+
+# Versiones de pypdf (mayor.menor) con las que se verifico el uso de sus
+# internos: la tabla PdfWriter._id_translated y StreamObject._data. Con otra
+# version las paginas se copian sin unificar (ver tests/test_pdfdedupe.py)
+PYPDF_TESTED_VERSIONS = ("5.0",)
+_unsupported_logged = False
+
+# Los objetos de pypdf heredan de un Protocol y su isinstance pasa por
+# typing; en los recorridos se compara el tipo exacto de la referencia y
+# dict / list para diccionarios y arrays, que es mucho mas rapido
+
+
+def content_digest(obj, digests):
+    # Huella del contenido de un objeto. Los objetos referenciados entran por
+    # su propia huella y no por su numero: dos fuentes iguales que apuntan a
+    # descriptores y archivos de fuente duplicados dan la misma huella.
+    # digests guarda la huella de cada referencia ya visitada (por idnum)
+    if type(obj) is IndirectObject:
+        digest = digests.get(obj.idnum)
+        if digest is None:
+            # Marca provisoria: una referencia circular entra por su numero
+            digests[obj.idnum] = b"ref %d" % obj.idnum
+            digest = digests[obj.idnum] = content_digest(obj.get_object(), digests)
+        return digest
+
+    hasher = hashlib.sha1(type(obj).__name__.encode())
+    if isinstance(obj, dict):
+        for key in sorted(obj):
+            hasher.update(key.encode())
+            hasher.update(content_digest(dict.__getitem__(obj, key), digests))
+        if isinstance(obj, StreamObject):
+            hasher.update(obj._data)
+    elif isinstance(obj, list):
+        for item in obj:
+            hasher.update(content_digest(item, digests))
+    else:
+        hasher.update(obj.hash_value_data())
+    return hasher.digest()
+
+
+def _resolved(obj):
+    # dict.get de pypdf no resuelve las referencias, a diferencia de []
+    return obj.get_object() if obj is not None else None
+
+
+def resource_references(page):
+    # Referencias a las fuentes y XObjects de /Resources de la pagina
+    resources = _resolved(page.get("/Resources"))
+    if not isinstance(resources, DictionaryObject):
+        return
+    for category in DEDUPE_RESOURCE_CATEGORIES:
+        entries = _resolved(resources.get(category))
+        if not isinstance(entries, DictionaryObject):
+            continue
+        for reference in dict.values(entries):
+            if type(reference) is IndirectObject:
+                yield reference
+
+
+def internals_supported(writer):
+    version = ".".join(pypdf.__version__.split(".")[:2])
+    return (version in PYPDF_TESTED_VERSIONS
+            and isinstance(getattr(writer, "_id_translated", None), dict)
+            and hasattr(StreamObject(), "_data"))
+
+
+def add_pages_deduped(writer, pages):
+    # Agrega las paginas al writer con una sola copia de cada fuente y
+    # XObject. pypdf ya copia una vez lo que las paginas comparten por
+    # referencia, pero no lo que el original repite como objetos distintos
+    # con el mismo contenido (una fuente o un logo por pagina). Antes de
+    # copiar cada pagina, sus recursos repetidos se anotan en la tabla de
+    # objetos ya copiados de pypdf como la copia del primero, asi no se
+    # copian ni se escriben. Un repetido dentro de la misma pagina en que
+    # aparece el primero se copia igual. Devuelve cuantas referencias se
+    # unificaron
+    global _unsupported_logged
+    if not internals_supported(writer):
+        if not _unsupported_logged:
+            _unsupported_logged = True
+            logger.warning(f"Advertencia: pypdf {pypdf.__version__} no verificado; "
+                           "los recursos repetidos de los bloques no se unifican.")
+        for page in pages:
+            writer.add_page(page)
+        return 0
+
+    digests = {}
+    canonical = {}
+    merged = 0
+    for page in pages:
+        source = page.indirect_reference.pdf if page.indirect_reference else None
+        translated = writer._id_translated.get(id(source), {})
+        for reference in resource_references(page):
+            first = canonical.setdefault(content_digest(reference, digests), reference)
+            if (first.idnum != reference.idnum and first.pdf is reference.pdf is source
+                    and first.idnum in translated and reference.idnum not in translated):
+                translated[reference.idnum] = translated[first.idnum]
+                merged += 1
+        writer.add_page(page)
+    return merged
@@ -0,0 +1,121 @@
+import cProfile
+import io
+import logging
+import os
+import pstats
+import threading
+import tracemalloc
+
+logger = logging.getLogger("dsi.profiling")
+
+# Archivo de control: si aparece en input_pdf, el proximo PDF se perfila
+PROFILE_CONTROL_FILE = "PERFILAR"
+# Frames guardados por asignacion y lineas de cada reporte
+TRACEMALLOC_FRAMES = 10
+REPORT_TOP = 40
+# Cada cuanto se mira la memoria trazada para quedarse con el snapshot del pico
+PEAK_SAMPLE_INTERVAL = 0.5
+
+_requested = False
+_lock = threading.Lock()
+
+
+def request_profile():
+    # Pide perfilar el proximo archivo (opcion --profile)
+    global _requested
+    with _lock:
+        _requested = True
+
+
+def take_profile_request(control_directory):
+    # Devuelve True una sola vez por pedido: por --profile o por el archivo
+    # de control, que se borra al tomarlo
+    global _requested
+    with _lock:
+        if _requested:
+            _requested = False
+            return True
+        try:
+            os.remove(os.path.join(control_directory, PROFILE_CONTROL_FILE))
+        except FileNotFoundError:
+            return False
+        except OSError as e:
+            logger.warning(f"Advertencia: No se pudo tomar el archivo de control {PROFILE_CONTROL_FILE}. {e}")
+            return False
+        return True
+
+
+class _PeakSampler(threading.Thread):
+    # Toma un snapshot de tracemalloc cada vez que la memoria trazada supera
+    # el maximo visto: el reporte muestra lo que estaba vivo cerca del pico y
+    # no lo poco que queda al terminar
+
+    def __init__(self):
+        super().__init__(name="dsi-profiling", daemon=True)
+        self.snapshot = None
+        self._highest = 0
+        self._stop_event = threading.Event()
+
+    def run(self):
+        while not self._stop_event.wait(PEAK_SAMPLE_INTERVAL):
+            self.sample()
+
+    def sample(self):
+        current, _ = tracemalloc.get_traced_memory()
+        if current > self._highest:
+            self._highest = current
+            self.snapshot = tracemalloc.take_snapshot()
+
+    def stop(self):
+        self._stop_event.set()
+        self.join()
+        self.sample()
+
+
+def run_profiled(output_directory, name, func, *args, **kwargs):
+    # Ejecuta func bajo cProfile y tracemalloc y guarda en output_directory
+    # <name>.prof (para snakeviz / pstats) y <name>.perfil.txt con las
+    # funciones mas costosas y las lineas que mas memoria asignaron.
+    # cProfile solo ve el hilo que llama: func debe hacer el trabajo en el.
+    started_tracing = not tracemalloc.is_tracing()
+    if started_tracing:
+        tracemalloc.start(TRACEMALLOC_FRAMES)
+    profiler = cProfile.Profile()
+    sampler = _PeakSampler()
+    sampler.start()
+    try:
+        result = profiler.runcall(func, *args, **kwargs)
+    finally:
+        sampler.stop()
+        _, peak = tracemalloc.get_traced_memory()
+        if started_tracing:
+            tracemalloc.stop()
+    snapshot = sampler.snapshot
+
+    try:
+        os.makedirs(output_directory, exist_ok=True)
+        base = os.path.join(output_directory, name)
+        profiler.dump_stats(f"{base}.prof")
+        with open(f"{base}.perfil.txt", "w", encoding="utf-8") as report:
+            report.write(profile_report(profiler, snapshot, peak))
+        logger.info(f"Perfil guardado en {base}.prof y {base}.perfil.txt")
+    except OSError as e:
+        logger.error(f"Error: No se pudo guardar el perfil de {name}. {e}")
+    return result
+
+
+def profile_report(profiler, snapshot, peak):
+    output = io.StringIO()
+    output.write(f"Memoria maxima trazada: {peak / 1024 / 1024:.1f} MB\n\n")
+    output.write(f"Funciones por tiempo acumulado (top {REPORT_TOP})\n")
+    stats = pstats.Stats(profiler, stream=output)
+    stats.sort_stats(pstats.SortKey.CUMULATIVE).print_stats(REPORT_TOP)
+
+    snapshot = snapshot.filter_traces((
+        tracemalloc.Filter(False, tracemalloc.__file__),
+        tracemalloc.Filter(False, "<frozen importlib._bootstrap>"),
+    ))
+    output.write(f"\nMemoria viva cerca del pico, por linea (top {REPORT_TOP})\n")
+    for statistic in snapshot.statistics("lineno")[:REPORT_TOP]:
+        output.write(f"{statistic}\n")
+    return output.getvalue()
@@ -0,0 +1,48 @@
+import os
+import time
+
+# Bytes del final del archivo donde se busca el marcador %%EOF
+TRAILER_SCAN_BYTES = 2048
+
+
+def pdf_trailer_complete(path):
+    # Un PDF copiado a medias todavia no tiene el %%EOF final
+    try:
+        with open(path, "rb") as pdf_file:
+            pdf_file.seek(0, os.SEEK_END)
+            size = pdf_file.tell()
+            pdf_file.seek(max(0, size - TRAILER_SCAN_BYTES))
+            tail = pdf_file.read()
+    except OSError:
+        # En Windows el archivo puede seguir bloqueado por quien lo copia
+        return False
+    return b"%%EOF" in tail
+
+
+def wait_until_ready(path, timeout=600, initial_delay=0.05, max_delay=1.0):
+    # Espera a que el archivo este completo: mismo tamano y mtime entre dos
+    # sondeos consecutivos y trailer del PDF presente. Mientras el archivo
+    # crece el intervalo de sondeo se duplica hasta max_delay, asi los
+    # archivos chicos arrancan enseguida y las copias largas por SMB no
+    # generan sondeos innecesarios.
+    # Devuelve False si el archivo desaparece o no se completa a tiempo.
+    deadline = time.monotonic() + timeout
+    delay = initial_delay
+    previous = None
+
+    while True:
+        try:
+            stat = os.stat(path)
+        except FileNotFoundError:
+            return False
+
+        current = (stat.st_size, stat.st_mtime_ns)
+        if current == previous and stat.st_size > 0 and pdf_trailer_complete(path):
+            return True
+
+        if time.monotonic() + delay > deadline:
+            return False
+
+        previous = current
+        time.sleep(delay)
+        delay = min(delay * 2, max_delay)
@@ -0,0 +1,98 @@
+# La busqueda de limites (galope + binaria) debe dar los mismos bloques que
+# recorrer todas las paginas, tambien cuando una pagina no se pudo leer
+import pytest
+from pypdf import PdfReader
+
+import main
+from boundaries import block_key, search_boundaries
+from synthetic_dsi import generate_dsi
+
+A = "20000000001"
+B = "20000000019"
+C = "20000000027"
+
+
+def pages(*runs):
+    # runs: (cuit, nro_guia, paginas) consecutivos
+    fields = [(cuit, nro_guia) for cuit, nro_guia, count in runs for _ in range(count)]
+    return [main.PageRecord(index=index, text=None, lines=None, cuit=cuit, nro_guia=nro_guia)
+            for index, (cuit, nro_guia) in enumerate(fields)]
+
+
+def blocks(records):
+    return list(main.iter_blocks(records, main.LogBuffer()))
+
+
+def search(records, start=0):
+    analyzed = []
+
+    def analyze(page_num):
+        analyzed.append(page_num)
+        return records[page_num]
+
+    found = list(search_boundaries(analyze, len(records), start=start))
+    return found, analyzed
+
+
+CASES = {
+    "guias de una pagina": pages((A, "AF100001", 1), (B, "AF100002", 1), (A, "AF100003", 1),
+                                 (C, "AF100004", 12), (B, "AF100005", 1)),
+    "cuit ilegible dentro de la guia": pages((A, "AF100001", 5), (None, "AF100001", 1),
+                                             (A, "AF100001", 10), (B, "AF100002", 4)),
+    "nro_guia ilegible dentro de la guia": pages((A, "AF100001", 6), (A, None, 1),
+                                                 (A, "AF100001", 9), (B, "AF100002", 4)),
+    "nro_guia invalido dentro de la guia": pages((A, "AF100001", 2), (A, "AF1", 1),
+                                                 (A, "AF100001", 13), (B, "AF100002", 4)),
+    "nro_guia ilegible en la primera pagina": pages((A, "AF100001", 4), (B, None, 1),
+                                                    (B, "AF100002", 7), (C, "AF100003", 3)),
+    "nro_guia ilegible en la primera pagina del archivo": pages((A, None, 1), (A, "AF100001", 9),
+                                                                (B, "AF100002", 2)),
+    "cuit ilegible en la primera pagina": pages((A, "AF100001", 4), (None, "AF100002", 1),
+                                                (B, "AF100002", 7)),
+}
+
+
+@pytest.mark.parametrize("name", CASES)
+def test_search_matches_exhaustive(name):
+    records = CASES[name]
+    found, _ = search(records)
+
+    assert [record.index for record in found] == list(range(len(records)))
+    assert blocks(found) == blocks(records)
+
+
+@pytest.mark.parametrize("name", CASES)
+@pytest.mark.parametrize("start", [1, 3, 5, 9])
+def test_search_from_start_matches_exhaustive(name, start):
+    records = CASES[name]
+    found, analyzed = search(records, start)
+
+    assert min(analyzed) == start
+    assert [record.index for record in found] == list(range(start, len(records)))
+    assert blocks(found) == blocks(records[start:])
+
+
+def test_search_skips_pages_inside_a_guia():
+    records = pages((A, "AF100001", 30), (B, "AF100002", 30))
+    found, analyzed = search(records)
+
+    assert len(set(analyzed)) < len(records) // 2
+    assert [block_key(record) for record in found] == [block_key(record) for record in records]
+
+
+@pytest.mark.parametrize("pages_per_guia", [1, 10])
+@pytest.mark.parametrize("first_page", [0, 7])
+def test_analyze_pages_matches_exhaustive(tmp_path, monkeypatch, pages_per_guia, first_page):
+    # Sobre un DSI sintetico, con guias de una y de varias paginas y con un
+    # tramo que no empieza en la primera pagina
+    path = generate_dsi(str(tmp_path / "dsi.pdf"), 30, pages_per_guia=pages_per_guia)
+    reader = PdfReader(path)
+    total_pages = len(reader.pages) - 1
+
+    results = {}
+    for boundary_search in (False, True):
+        monkeypatch.setattr(main, "BOUNDARY_SEARCH", boundary_search)
+        results[boundary_search] = blocks(main.analyze_pages(reader, total_pages, first_page=first_page))
+
+    assert results[True] == results[False]
+    assert results[False][0].start == first_page
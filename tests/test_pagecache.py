@@ -0,0 +1,44 @@
+from pagecache import PageCache
+
+
+def rows(file_hash, pages):
+    return [(file_hash, page, "20000000001", "AF100001") for page in range(pages)]
+
+
+def table_bytes(cache):
+    return cache._connection.execute("SELECT COALESCE(SUM(size), 0) FROM pages").fetchone()[0]
+
+
+def test_replaced_rows_are_counted_once(tmp_path):
+    cache = PageCache(str(tmp_path / "cache.sqlite"))
+    cache.store(rows("a" * 64, 100))
+    size = cache._total_bytes
+
+    # El mismo archivo procesado otra vez
+    cache.store(rows("a" * 64, 100))
+
+    assert cache._total_bytes == size == table_bytes(cache)
+
+
+def test_replaced_rows_do_not_evict(tmp_path):
+    cache = PageCache(str(tmp_path / "cache.sqlite"))
+    cache.store(rows("a" * 64, 100))
+    cache.store(rows("b" * 64, 100))
+    cache.max_bytes = cache._total_bytes
+
+    for _ in range(3):
+        cache.store(rows("b" * 64, 100))
+
+    assert cache.open_file("a" * 64).entries
+    assert cache._total_bytes == table_bytes(cache)
+
+
+def test_eviction_drops_least_recently_used_file(tmp_path):
+    cache = PageCache(str(tmp_path / "cache.sqlite"))
+    cache.store(rows("a" * 64, 100))
+    cache.max_bytes = cache._total_bytes
+    cache.store(rows("b" * 64, 100))
+
+    assert not cache.open_file("a" * 64).entries
+    assert cache.open_file("b" * 64).entries
+    assert cache._total_bytes == table_bytes(cache)
@@ -0,0 +1,78 @@
+# add_pages_deduped escribe en la tabla interna de pypdf (PdfWriter._id_translated)
+# y lee StreamObject._data: estas pruebas fallan si un cambio de pypdf rompe
+# la unificacion de recursos o altera el contenido de las paginas
+import io
+
+from pypdf import PdfReader, PdfWriter
+
+import pdfdedupe
+from synthetic_dsi import generate_dsi
+
+PAGES = 6
+
+
+def write_pages(pages, deduped):
+    writer = PdfWriter()
+    merged = None
+    if deduped:
+        merged = pdfdedupe.add_pages_deduped(writer, pages)
+    else:
+        for page in pages:
+            writer.add_page(page)
+    output = io.BytesIO()
+    writer.write(output)
+    return PdfReader(output), merged
+
+
+def resource_ids(reader):
+    return {reference.idnum for page in reader.pages for reference in pdfdedupe.resource_references(page)}
+
+
+def test_tested_pypdf_version():
+    # Al actualizar pypdf, verificar estas pruebas y agregar la version a
+    # PYPDF_TESTED_VERSIONS
+    assert pdfdedupe.internals_supported(PdfWriter())
+
+
+def test_repeated_resources_are_merged(tmp_path):
+    path = generate_dsi(str(tmp_path / "dsi.pdf"), PAGES, pages_per_guia=PAGES, duplicate_resources=True)
+    pages = PdfReader(path).pages[:PAGES]
+    per_page = len(list(pdfdedupe.resource_references(pages[0])))
+    assert per_page >= 2
+
+    plain, _ = write_pages(pages, deduped=False)
+    deduped, merged = write_pages(pages, deduped=True)
+
+    assert len(resource_ids(plain)) == per_page * PAGES
+    assert merged == per_page * (PAGES - 1)
+    assert len(resource_ids(deduped)) == per_page
+
+
+def test_page_content_is_unchanged(tmp_path):
+    path = generate_dsi(str(tmp_path / "dsi.pdf"), PAGES, pages_per_guia=PAGES, duplicate_resources=True)
+    pages = PdfReader(path).pages[:PAGES]
+    plain, _ = write_pages(pages, deduped=False)
+    deduped, _ = write_pages(pages, deduped=True)
+
+    assert len(deduped.pages) == PAGES
+    for original, expected, page in zip(pages, plain.pages, deduped.pages):
+        assert page.extract_text() == expected.extract_text() == original.extract_text()
+        # Cada nombre de recurso apunta a un objeto con el mismo contenido
+        for category in pdfdedupe.DEDUPE_RESOURCE_CATEGORIES:
+            entries = page["/Resources"][category]
+            expected_entries = expected["/Resources"][category]
+            assert sorted(entries) == sorted(expected_entries)
+            for name in entries:
+                assert (pdfdedupe.content_digest(entries.raw_get(name), {})
+                        == pdfdedupe.content_digest(expected_entries.raw_get(name), {}))
+
+
+def test_unsupported_pypdf_copies_pages(tmp_path, monkeypatch):
+    path = generate_dsi(str(tmp_path / "dsi.pdf"), PAGES, pages_per_guia=PAGES, duplicate_resources=True)
+    pages = PdfReader(path).pages[:PAGES]
+    monkeypatch.setattr(pdfdedupe, "PYPDF_TESTED_VERSIONS", ())
+
+    deduped, merged = write_pages(pages, deduped=True)
+
+    assert merged == 0
+    assert len(resource_ids(deduped)) == len(list(pdfdedupe.resource_references(pages[0]))) * PAGES
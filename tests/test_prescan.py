@@ -0,0 +1,49 @@
+# Un CUIT / nro_guia del pre-escaneo que no coincide con una guia ya
+# confirmada se verifica con extract_text antes de usarlo
+from pypdf import PdfReader
+
+import main
+from fields import RawFieldScanner
+from synthetic_dsi import generate_dsi
+
+
+class MisreadingScanner(RawFieldScanner):
+    # Pre-escaneo que lee mal el nro_guia de las paginas de `misread`
+    def __init__(self, misread):
+        super().__init__()
+        self.misread = misread
+
+    def read(self, page, page_number):
+        fields = super().read(page, page_number)
+        if fields and page_number in self.misread:
+            return fields[0], "AF999999"
+        return fields
+
+
+def analyze(path, scanner):
+    reader = PdfReader(path)
+    return [main.analyze_page(reader.pages[page_num], page_num, scanner=scanner)
+            for page_num in range(len(reader.pages) - 1)]
+
+
+def test_new_guia_is_confirmed_with_extract_text(tmp_path):
+    path = generate_dsi(str(tmp_path / "dsi.pdf"), 12, pages_per_guia=3)
+    expected = [(record.cuit, record.nro_guia) for record in analyze(path, None)]
+
+    # Pagina 6: primera de una guia; pagina 7: en medio de una guia
+    scanner = MisreadingScanner({6, 7})
+    records = analyze(path, scanner)
+
+    assert [(record.cuit, record.nro_guia) for record in records] == expected
+    # La lectura equivocada se detecta y el pre-escaneo se desactiva
+    assert not scanner.enabled
+
+
+def test_pages_of_a_confirmed_guia_skip_extract_text(tmp_path):
+    path = generate_dsi(str(tmp_path / "dsi.pdf"), 12, pages_per_guia=6)
+    scanner = RawFieldScanner(calibration_pages=1)
+    records = analyze(path, scanner)
+
+    assert scanner.enabled
+    # Solo la primera pagina de cada guia pasa por extract_text
+    assert [record.index for record in records if record.text is not None] == [0, 6]